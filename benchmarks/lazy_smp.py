@@ -0,0 +1,27 @@
+"""
+Time to reach a fixed depth with Lazy SMP AlphaBeta from 1 to N worker processes.
+
+Usage: python -m benchmarks.lazy_smp [max_workers] [depth]
+"""
+import os
+
+from benchmarks.utils import build_positional_evaluator, get_benchmark_boards, get_int_argument, get_worker_counts, \
+    run_alpha_beta
+
+
+def main():
+    max_workers = get_int_argument(1, os.cpu_count())
+    depth = get_int_argument(2, 5)
+
+    evaluator = build_positional_evaluator()
+    boards = get_benchmark_boards()
+
+    baseline = None
+    for workers in get_worker_counts(max_workers):
+        nodes, _, elapsed, _ = run_alpha_beta(evaluator, boards, depth, workers=workers)
+        baseline = baseline or elapsed
+        print(f"workers={workers:3d}  seconds={elapsed:8.2f}  speedup={baseline / elapsed:5.2f}  main nodes={nodes:9d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Iterations per second of root-parallel MCTS from 1 to N worker processes.
+
+Usage: python -m benchmarks.mcts_parallel [max_workers] [iterations]
+"""
+import os
+import time
+
+from benchmarks.utils import build_positional_evaluator, get_benchmark_boards, get_int_argument, get_worker_counts
+from engine.mcts import MCTS
+
+
+def main():
+    max_workers = get_int_argument(1, os.cpu_count())
+    iterations = get_int_argument(2, 2000)
+
+    mcts = MCTS(build_positional_evaluator(), seed=0)
+    boards = get_benchmark_boards()
+
+    for workers in get_worker_counts(max_workers):
+        start = time.perf_counter()
+        for board in boards:
+            mcts.get_best_move(board, iterations=iterations, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers:3d}  iterations/sec={len(boards) * iterations / elapsed:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
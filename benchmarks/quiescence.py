@@ -0,0 +1,29 @@
+"""
+Quiescence node counts of fixed-depth searches with static exchange and delta pruning on and off.
+
+Usage: python -m benchmarks.quiescence [depth]
+"""
+from benchmarks.utils import build_positional_evaluator, get_benchmark_boards, get_int_argument, run_alpha_beta
+
+CONFIGURATIONS = [
+    ("none", False, False),
+    ("see", True, False),
+    ("delta", False, True),
+    ("see+delta", True, True),
+]
+
+
+def main():
+    depth = get_int_argument(1, 3)
+
+    evaluator = build_positional_evaluator()
+    boards = get_benchmark_boards()
+
+    for name, see_pruning, delta_pruning in CONFIGURATIONS:
+        nodes, qnodes, elapsed, moves = run_alpha_beta(evaluator, boards, depth, see_pruning=see_pruning,
+                                                       delta_pruning=delta_pruning)
+        print(f"{name:10s}  nodes={nodes:8d}  qnodes={qnodes:8d}  time={elapsed:6.2f}s  moves={' '.join(moves)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+AlphaBeta nodes per second on chess.Board against SearchBoard, with its incrementally updated zobrist hash.
+
+Usage: python -m benchmarks.search_board [depth]
+"""
+from benchmarks.utils import build_positional_evaluator, get_benchmark_boards, get_int_argument, run_alpha_beta
+
+
+def main():
+    depth = get_int_argument(1, 4)
+
+    evaluator = build_positional_evaluator()
+    boards = get_benchmark_boards()
+
+    for use_search_board in (False, True):
+        nodes, _, elapsed, _ = run_alpha_beta(evaluator, boards, depth, use_search_board=use_search_board)
+        name = "SearchBoard" if use_search_board else "chess.Board"
+        print(f"{name:12s}  nodes={nodes:9d}  seconds={elapsed:7.2f}  nodes/sec={nodes / elapsed:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
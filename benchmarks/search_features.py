@@ -0,0 +1,32 @@
+"""
+Nodes and time to a fixed depth with every search feature on, with each one turned off in turn, and with all off.
+
+Usage: python -m benchmarks.search_features [depth]
+"""
+from benchmarks.utils import build_positional_evaluator, get_benchmark_boards, get_int_argument, run_alpha_beta
+
+FEATURES = [
+    "principal_variation_search",
+    "null_move_pruning",
+    "late_move_reductions",
+    "check_extensions",
+    "mate_distance_pruning",
+]
+
+
+def main():
+    depth = get_int_argument(1, 4)
+
+    evaluator = build_positional_evaluator()
+    boards = get_benchmark_boards()
+
+    configurations = [("all", {})]
+    configurations += [(f"no {feature}", {feature: False}) for feature in FEATURES]
+    configurations += [("none", {feature: False for feature in FEATURES})]
+    for name, switches in configurations:
+        nodes, _, elapsed, moves = run_alpha_beta(evaluator, boards, depth, **switches)
+        print(f"{name:30s}  nodes={nodes:8d}  time={elapsed:6.2f}s  moves={' '.join(moves)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import sys
+import time
+from typing import List, Tuple, Any
+
+import chess
+
+from engine.alpha_beta import AlphaBeta
+from heuristic.features.king_endgame_evaluator import KingEndgameEvaluator
+from heuristic.features.king_safety_evaluator import KingSafetyEvaluator
+from heuristic.features.material_evaluator import MaterialEvaluator
+from heuristic.features.pawn_structure_evaluator import PawnStructureEvaluator
+from heuristic.features.piece_mobility_evaluator import PieceMobilityEvaluator
+from heuristic.features.piece_square_evaluator import PieceSquareEvaluator
+from heuristic.features.strategic_bonus_evaluator import StrategicBonusEvaluator
+from heuristic.positional_evaluator import PositionalEvaluator
+
+BENCHMARK_FENS = [
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+]
+
+
+def build_positional_evaluator() -> PositionalEvaluator:
+    return PositionalEvaluator(
+        material_evaluator=MaterialEvaluator({}),
+        piece_mobility_evaluator=PieceMobilityEvaluator({}),
+        pawn_structure_evaluator=PawnStructureEvaluator({}),
+        king_safety_evaluator=KingSafetyEvaluator({}),
+        strategic_bonus_evaluator=StrategicBonusEvaluator({}),
+        king_endgame_evaluator=KingEndgameEvaluator({}),
+        piece_square_evaluator=PieceSquareEvaluator({})
+    )
+
+
+def get_benchmark_boards() -> List[chess.Board]:
+    return [chess.Board(fen) for fen in BENCHMARK_FENS]
+
+
+def get_int_argument(index: int, default: int) -> int:
+    """
+    The command line argument at index as an integer, or default when it is not given.
+    """
+    return int(sys.argv[index]) if len(sys.argv) > index else default
+
+
+def get_worker_counts(max_workers: int) -> List[int]:
+    """
+    Powers of two up to max_workers, followed by max_workers itself.
+    """
+    return sorted({2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers} | {max_workers})
+
+
+def run_alpha_beta(evaluator: PositionalEvaluator, boards: List[chess.Board], depth: int, workers: int = 1,
+                   **options: Any) -> Tuple[int, int, float, List[str]]:
+    """
+    Searches every board to depth with a new AlphaBeta built with options.
+
+    Returns:
+        The nodes and quiescence nodes of all the searches, the seconds they took and their moves in UCI notation
+    """
+    nodes = 0
+    qnodes = 0
+    moves = []
+    start = time.perf_counter()
+    for board in boards:
+        search = AlphaBeta(evaluator, **options)
+        moves.append(search.get_best_move(board, depth=depth, workers=workers).uci())
+        nodes += search.stats.nodes
+        qnodes += search.stats.qnodes
+    return nodes, qnodes, time.perf_counter() - start, moves
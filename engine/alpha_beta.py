@@ -1,98 +1,622 @@
-from typing import List, Dict
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple, Iterator, Any
 
 import chess
 
-from heuristic.evaluator import Evaluator
+from engine.move_generation import get_outcome, LOSS
+from engine.move_history import MoveHistory
+from engine.search_board import SearchBoard, get_zobrist_hash
+from engine.search_stats import SearchStats
+from engine.shared_transposition_table import SharedTranspositionTable
+from engine.transposition_table import BaseTranspositionTable, TranspositionTable, DEFAULT_SIZE_MB, EXACT, \
+    LOWER_BOUND, UPPER_BOUND
+from engine.worker_setup import WorkerSetup
+from heuristic.evaluator import Evaluator, PIECE_TO_VALUE
+from heuristic.features.phase_evaluator import PhaseEvaluator
 
 CHECKMATE_SCORE = 10000
 DRAW_SCORE = 0
 
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 64
+QUIESCENCE_DEPTH = 0
+
+# Plies from the root beyond which nodes are no longer extended. Being mated at ply p scores
+# -(CHECKMATE_SCORE + MAX_PLY - p), so that shorter mates score higher whatever the depth searched.
+MAX_PLY = 2 * MAX_DEPTH
+
+ASPIRATION_WINDOW = 50.0
+ASPIRATION_WIDENING = 4.0
+ASPIRATION_ATTEMPTS = 2
+
+TIME_CHECK_INTERVAL = 64
+
+# Seconds between checks that Lazy SMP helpers are still alive while waiting for their results.
+HELPER_RESULT_TIMEOUT = 0.1
+
+# In MultiPV mode, root moves outside the best ones are scored exactly down to this far below the last of them.
+MULTI_PV_WINDOW = 100.0
+
+# Quiescence skips a capture when even winning the captured piece leaves the score this far below alpha.
+DELTA_MARGIN = 200.0
+
+# Null-move pruning is tried from this depth, with this reduction (deeper from NULL_MOVE_DEEP_DEPTH),
+# and only while the phase shows enough pieces on the board for zugzwang to be unlikely.
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 7
+NULL_MOVE_DEEP_REDUCTION = 3
+NULL_MOVE_MIN_PHASE = 0.2
+
+# Quiet moves from the LMR_MIN_MOVES-th onwards are searched one ply shallower first, two from LMR_DEEP_MOVES.
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_DEEP_MOVES = 6
+
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when the time or node budget is exhausted.
+    """
+    pass
+
 
 class AlphaBeta:
-    def __init__(self, evaluator: Evaluator):
+    def __init__(self, evaluator: Evaluator, transposition_table_size_mb: float = DEFAULT_SIZE_MB,
+                 use_move_history: bool = True, see_pruning: bool = True, delta_pruning: bool = True,
+                 principal_variation_search: bool = True, null_move_pruning: bool = True,
+                 late_move_reductions: bool = True, check_extensions: bool = True,
+                 mate_distance_pruning: bool = True, use_search_board: bool = False):
+        """
+        Args:
+            use_move_history: Whether quiet moves are ordered by the killer, counter-move and history heuristics
+            see_pruning: Whether quiescence skips captures losing material by static exchange evaluation
+            delta_pruning: Whether quiescence skips captures that cannot bring the score back up to alpha
+            principal_variation_search: Whether moves after the first are searched with a zero window first
+            null_move_pruning: Whether to cut nodes where passing still fails high at a reduced depth
+            late_move_reductions: Whether quiet moves late in the ordering are searched shallower first
+            check_extensions: Whether nodes in check are searched one ply deeper
+            mate_distance_pruning: Whether to cut nodes that cannot improve on a mate already found
+            use_search_board: Whether to search a SearchBoard copy of the given board, with incremental hashing
+        """
         self.evaluator: Evaluator = evaluator
+        self.transposition_table_size_mb: float = transposition_table_size_mb
+        self.transposition_table: BaseTranspositionTable = TranspositionTable(transposition_table_size_mb)
+        self.stats: SearchStats = SearchStats()
+        self.principal_variation: List[chess.Move] = []
+        self.root_principal_variations: Dict[chess.Move, List[chess.Move]] = {}
+        self.move_history: Optional[MoveHistory] = MoveHistory() if use_move_history else None
+        self.see_pruning: bool = see_pruning
+        self.delta_pruning: bool = delta_pruning
+        self.principal_variation_search: bool = principal_variation_search
+        self.null_move_pruning: bool = null_move_pruning
+        self.late_move_reductions: bool = late_move_reductions
+        self.check_extensions: bool = check_extensions
+        self.mate_distance_pruning: bool = mate_distance_pruning
+        self.use_search_board: bool = use_search_board
 
-    def get_best_move(self, board: chess.Board, depth: int = 3) -> chess.Move:
+        self._root_stack_size: int = 0
+        self._pv_moves: Dict[int, chess.Move] = {}
+        self._deadline: Optional[float] = None
+        self._max_nodes: Optional[int] = None
+        self._stop_event: Optional[Any] = None
+
+    def get_best_move(self, board: chess.Board, depth: Optional[int] = None, max_time_ms: Optional[float] = None,
+                      max_nodes: Optional[int] = None, workers: int = 1) -> chess.Move:
+        """
+        Iteratively deepens from depth 1 and returns the best move of the last completed iteration.
+
+        Args:
+            board: The position to search
+            depth: The maximum depth; defaults to 3 without limits and to unbounded with limits
+            max_time_ms: Wall-clock budget after which the running iteration is aborted
+            max_nodes: Node budget after which the running iteration is aborted, per process
+            workers: Number of processes searching the root together through a shared transposition table (Lazy SMP)
+        """
+        if depth is None:
+            depth = DEFAULT_DEPTH if max_time_ms is None and max_nodes is None else MAX_DEPTH
+        if workers > 1:
+            return self._get_best_move_parallel(board, depth, max_time_ms, max_nodes, workers)
+        return self._iterative_deepening(board, depth, max_time_ms, max_nodes)
+
+    def _iterative_deepening(self, board: chess.Board, depth: int, max_time_ms: Optional[float],
+                             max_nodes: Optional[int], first_depth: int = 1) -> chess.Move:
+        board = self._get_search_board(board)
+        start_time = time.perf_counter()
+        self.stats = SearchStats()
+        self.principal_variation = []
+        self._pv_moves = {}
+        self._deadline = start_time + max_time_ms / 1000.0 if max_time_ms is not None else None
+        self._max_nodes = max_nodes
+        if self.move_history is not None:
+            self.move_history.age()
+
+        root_stack_size = len(board.move_stack)
+        self._root_stack_size = root_stack_size
+        best_move = None
+        self.evaluator.begin_search(board)
+        try:
+            for current_depth in range(first_depth, depth + 1):
+                move, score = self._aspiration_search(board, current_depth)
+                if move is None:
+                    break
+                best_move = move
+                self.stats.depth = current_depth
+                self.stats.score = score
+                self._update_principal_variation(board, current_depth)
+                if abs(score) >= CHECKMATE_SCORE:
+                    break
+        except SearchAborted:
+            self.stats.aborted = True
+            while len(board.move_stack) > root_stack_size:
+                self._pop(board)
+        finally:
+            self.evaluator.end_search()
+            self._deadline = None
+            self._max_nodes = None
+            self.stats.elapsed_ms = (time.perf_counter() - start_time) * 1000.0
+
+        if best_move is None:
+            moves = self.order_moves(board)
+            best_move = moves[0] if moves else None
+        return best_move
+
+    def _get_best_move_parallel(self, board: chess.Board, depth: int, max_time_ms: Optional[float],
+                                max_nodes: Optional[int], workers: int) -> chess.Move:
+        """
+        Lazy SMP: helper processes search the same root as this one, all sharing a transposition table, so that
+        each process mostly probes entries another one has already computed. Odd helpers start and stop one ply
+        deeper, spreading the processes over different depths. Once this process completes its own search the
+        helpers are stopped, and the move of the deepest iteration completed by any process is returned.
+        """
+        setup = WorkerSetup(self, board)
+        context = multiprocessing.get_context()
+        table = SharedTranspositionTable(self.transposition_table_size_mb)
+        stop_event = context.Event()
+        results = context.Queue()
+        helpers = [
+            context.Process(target=_search_lazy_smp_helper, args=(
+                setup, table, helper, depth, max_time_ms, max_nodes, stop_event, results
+            ))
+            for helper in range(1, workers)
+        ]
+        for helper in helpers:
+            helper.start()
+
+        transposition_table = self.transposition_table
+        self.transposition_table = table
+        # Results are drained before joining: a process exits only once what it put on a queue has been read.
+        helper_results = []
+        try:
+            best_move = self._iterative_deepening(board, depth, max_time_ms, max_nodes)
+            stop_event.set()
+            _receive_helper_results(helpers, results, helper_results)
+
+            completed = [(self.stats.depth, best_move, self.stats.score)]
+            for helper_depth, uci, score in helper_results:
+                if uci is not None:
+                    completed.append((helper_depth, chess.Move.from_uci(uci), score))
+            best_depth, best_move, score = max(completed, key=lambda result: result[0])
+            if best_depth > self.stats.depth:
+                self.stats.depth = best_depth
+                self.stats.score = score
+                self._update_principal_variation(board, best_depth)
+                if self.principal_variation[:1] != [best_move]:
+                    self.principal_variation = [best_move]
+        finally:
+            stop_event.set()
+            _receive_helper_results(helpers, results, helper_results)
+            for helper in helpers:
+                helper.join()
+            self.transposition_table = transposition_table
+            table.close()
+            table.unlink()
+        return best_move
+
+    def _search_as_helper(self, board: chess.Board, table: SharedTranspositionTable, helper: int, depth: int,
+                          max_time_ms: Optional[float], max_nodes: Optional[int],
+                          stop_event: Any) -> Tuple[int, Optional[str], float]:
+        """
+        Runs one Lazy SMP helper until its search completes or stop_event is set.
+
+        Returns:
+            The deepest completed depth, the best move in UCI notation and its score
+        """
+        stagger = helper % 2
+        self.transposition_table = table
+        self._stop_event = stop_event
+        try:
+            move = self._iterative_deepening(board, min(depth + stagger, MAX_DEPTH), max_time_ms, max_nodes,
+                                             first_depth=1 + stagger)
+        finally:
+            self._stop_event = None
+        return self.stats.depth, move.uci() if move is not None else None, self.stats.score
+
+    def _get_search_board(self, board: chess.Board) -> chess.Board:
+        if self.use_search_board and not isinstance(board, SearchBoard):
+            return SearchBoard.from_board(board)
+        return board
+
+    def _get_options(self) -> Dict[str, Any]:
+        return {
+            'evaluator': self.evaluator,
+            'transposition_table_size_mb': self.transposition_table_size_mb,
+            'use_move_history': self.move_history is not None,
+            'see_pruning': self.see_pruning,
+            'delta_pruning': self.delta_pruning,
+            'principal_variation_search': self.principal_variation_search,
+            'null_move_pruning': self.null_move_pruning,
+            'late_move_reductions': self.late_move_reductions,
+            'check_extensions': self.check_extensions,
+            'mate_distance_pruning': self.mate_distance_pruning,
+            'use_search_board': self.use_search_board,
+        }
+
+    def evaluate_root_moves(self, board: chess.Board, depth: int, workers: int = 1, multi_pv: Optional[int] = None,
+                            root_moves: Optional[List[chess.Move]] = None) -> Dict[chess.Move, float]:
+        """
+        Scores the root moves, best first by move ordering. The principal variation of every move with an exact
+        score is left in root_principal_variations.
+
+        Args:
+            board: The position to search
+            depth: The depth of every root move search, counting the root move
+            workers: Number of processes the root moves are spread over, sharing one transposition table
+            multi_pv: When given, only the best multi_pv moves are guaranteed exact scores and principal variations.
+                The other moves are searched in a window reaching MULTI_PV_WINDOW below the multi_pv-th best score
+                and are scored at that lower edge when they fail low.
+            root_moves: Restricts the search to these legal moves
+        """
+        if root_moves is None:
+            root_moves = list(board.legal_moves)
+        key = get_zobrist_hash(board)
+        entry = self.transposition_table.probe(key)
+        ordered_moves = [move for move in self.order_moves(board, entry.best_move if entry is not None else None)
+                         if move in root_moves]
+        if workers > 1 and len(ordered_moves) > 1:
+            return self._evaluate_root_moves_parallel(board, depth, workers, multi_pv, ordered_moves)
+
+        board = self._get_search_board(board)
+        scores = {}
+        self.root_principal_variations = {}
+        top_moves: List[Tuple[float, chess.Move]] = []
+        self._root_stack_size = len(board.move_stack)
+        self.evaluator.begin_search(board)
+        try:
+            for move in ordered_moves:
+                alpha = -float('inf')
+                if multi_pv is not None and len(top_moves) >= multi_pv:
+                    alpha = top_moves[-1][0] - MULTI_PV_WINDOW
+
+                self._push(board, move)
+                score = -self.negamax(board, depth - 1, -float('inf'), -alpha)
+                if score > alpha:
+                    self.root_principal_variations[move] = [move] + [
+                        pv_move for _, pv_move in self._read_principal_variation(board, depth - 1)
+                    ]
+                self._pop(board)
+                scores[move] = score
+
+                if multi_pv is not None and move in self.root_principal_variations:
+                    top_moves = sorted(top_moves + [(score, move)], key=lambda top_move: -top_move[0])
+                    for _, dropped_move in top_moves[multi_pv:]:
+                        del self.root_principal_variations[dropped_move]
+                    top_moves = top_moves[:multi_pv]
+        finally:
+            self.evaluator.end_search()
+        return scores
+
+    def _evaluate_root_moves_parallel(self, board: chess.Board, depth: int, workers: int, multi_pv: Optional[int],
+                                      ordered_moves: List[chess.Move]) -> Dict[chess.Move, float]:
+        """
+        Deals the ordered root moves round-robin to the workers, so that each one starts from strong moves.
+        A move among the best multi_pv overall is among the best multi_pv of its worker, so merging
+        the per-worker results keeps those scores and principal variations exact.
+        """
+        setup = WorkerSetup(self, board)
+        table = SharedTranspositionTable(self.transposition_table_size_mb)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                jobs = [
+                    executor.submit(_evaluate_root_moves_chunk, setup, table,
+                                    [move.uci() for move in ordered_moves[worker::workers]], depth, multi_pv)
+                    for worker in range(min(workers, len(ordered_moves)))
+                ]
+                results = [job.result() for job in jobs]
+        finally:
+            table.close()
+            table.unlink()
+
+        scores = {}
+        self.root_principal_variations = {}
+        for chunk_scores, chunk_principal_variations in results:
+            for uci, score in chunk_scores.items():
+                scores[chess.Move.from_uci(uci)] = score
+            for uci, principal_variation in chunk_principal_variations.items():
+                self.root_principal_variations[chess.Move.from_uci(uci)] = [
+                    chess.Move.from_uci(pv_uci) for pv_uci in principal_variation
+                ]
+
+        if multi_pv is not None:
+            top_moves = sorted(self.root_principal_variations, key=lambda move: -scores[move])[:multi_pv]
+            self.root_principal_variations = {move: self.root_principal_variations[move] for move in top_moves}
+        return {move: scores[move] for move in ordered_moves}
+
+    def _aspiration_search(self, board: chess.Board, depth: int) -> Tuple[Optional[chess.Move], float]:
+        """
+        Searches the root in a window centered on the previous iteration's score,
+        widening it each time the result falls outside.
+        """
+        if self.stats.depth == 0:
+            return self._search_root(board, depth, -float('inf'), float('inf'))
+
+        window = ASPIRATION_WINDOW
+        for _ in range(ASPIRATION_ATTEMPTS):
+            alpha = self.stats.score - window
+            beta = self.stats.score + window
+            move, score = self._search_root(board, depth, alpha, beta)
+            if alpha < score < beta:
+                return move, score
+            window *= ASPIRATION_WIDENING
+
+        return self._search_root(board, depth, -float('inf'), float('inf'))
+
+    def _search_root(self, board: chess.Board, depth: int,
+                     alpha: float, beta: float) -> Tuple[Optional[chess.Move], float]:
         best_move = None
         max_eval = -float('inf')
-        alpha = -float('inf')
-        beta = float('inf')
+        original_alpha = alpha
 
-        for move in self.order_moves(board):
-            board.push(move)
-            score = -self.negamax(board, depth - 1, -beta, -alpha)
-            board.pop()
+        key = get_zobrist_hash(board)
+        ply = len(board.move_stack) - self._root_stack_size
+        entry = self.transposition_table.probe(key)
+        tt_move = entry.best_move if entry is not None else None
+        tt_move = self._pv_moves.get(key, tt_move)
+
+        for index, move in enumerate(self.order_moves(board, tt_move)):
+            self._push(board, move)
+            if index and self.principal_variation_search:
+                score = self._search_zero_window(board, depth - 1, alpha, beta)
+            else:
+                score = -self.negamax(board, depth - 1, -beta, -alpha)
+            self._pop(board)
 
             if score > max_eval:
                 max_eval = score
                 best_move = move
 
-            alpha = max(alpha, score)
+            if score >= beta:
+                self._store_entry(key, depth, beta, LOWER_BOUND, move, ply)
+                return best_move, beta
 
-        return best_move
+            alpha = max(alpha, score)
 
-    def evaluate_root_moves(self, board: chess.Board, depth: int) -> Dict[chess.Move, float]:
-        scores = {}
-        for move in board.legal_moves:
-            board.push(move)
-            score = -self.negamax(board, depth - 1, -float('inf'), float('inf'))
-            board.pop()
-            scores[move] = score
-        return scores
+        bound = EXACT if max_eval > original_alpha else UPPER_BOUND
+        self._store_entry(key, depth, max_eval, bound, best_move, ply)
+        return best_move, max_eval
 
     def negamax(self, board: chess.Board, depth: int, alpha: float, beta: float) -> float:
-        if board.is_checkmate():
-            return -(CHECKMATE_SCORE + depth)
+        self._count_node()
+        ply = len(board.move_stack) - self._root_stack_size
 
-        if board.is_stalemate() or board.is_insufficient_material():
-            return DRAW_SCORE
+        if self.mate_distance_pruning:
+            alpha = max(alpha, self._get_mated_score(ply))
+            beta = min(beta, - self._get_mated_score(ply + 1))
+            if alpha >= beta:
+                return alpha
+
+        in_check = board.is_check()
+        if in_check and self.check_extensions and ply < MAX_PLY:
+            depth += 1
 
-        if depth == 0:
+        # Leaves only need to know whether the game is over. Interior nodes find checkmate and stalemate
+        # from the move picker yielding nothing, so that their moves are generated only once.
+        if depth <= 0:
+            outcome = get_outcome(board)
+            if outcome is not None:
+                return self._get_mated_score(ply) if outcome == LOSS else DRAW_SCORE
             return self.quiescence_search(board, alpha, beta)
 
+        if board.is_insufficient_material():
+            return DRAW_SCORE
+
+        key = get_zobrist_hash(board)
+        entry = self.transposition_table.probe(key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.best_move
+            if entry.depth >= depth:
+                cutoff = self._get_tt_cutoff(entry, alpha, beta, ply)
+                if cutoff is not None:
+                    return cutoff
+        tt_move = self._pv_moves.get(key, tt_move)
+
+        if self.null_move_pruning and not in_check and self._can_try_null_move(board, depth, beta):
+            reduction = NULL_MOVE_DEEP_REDUCTION if depth >= NULL_MOVE_DEEP_DEPTH else NULL_MOVE_REDUCTION
+            self._push(board, chess.Move.null())
+            score = - self.negamax(board, depth - 1 - reduction, -beta, -beta + 1)
+            self._pop(board)
+            if score >= beta:
+                return beta
+
+        original_alpha = alpha
         max_eval = -float('inf')
-        for move in self.order_moves(board):
-            board.push(move)
-            score = - self.negamax(board, depth - 1, -beta, -alpha)
-            board.pop()
+        best_move = None
+        num_moves = 0
+        for move in self.pick_moves(board, tt_move):
+            reduction = 0
+            if self.late_move_reductions and num_moves >= LMR_MIN_MOVES and depth >= LMR_MIN_DEPTH and not in_check \
+                    and not move.promotion and not board.is_capture(move) and not board.gives_check(move):
+                reduction = 2 if num_moves >= LMR_DEEP_MOVES else 1
+
+            self._push(board, move)
+            if not num_moves:
+                score = - self.negamax(board, depth - 1, -beta, -alpha)
+            elif reduction:
+                score = - self.negamax(board, depth - 1 - reduction, -alpha - 1, -alpha)
+                if score > alpha:
+                    score = self._search_zero_window(board, depth - 1, alpha, beta)
+            elif self.principal_variation_search:
+                score = self._search_zero_window(board, depth - 1, alpha, beta)
+            else:
+                score = - self.negamax(board, depth - 1, -beta, -alpha)
+            self._pop(board)
 
             if score >= beta:
+                self._store_cutoff(board, move, depth, num_moves)
+                self._store_entry(key, depth, beta, LOWER_BOUND, move, ply)
                 return beta
             if score > max_eval:
                 max_eval = score
+                best_move = move
             if score > alpha:
                 alpha = score
+            num_moves += 1
+
+        if not num_moves:
+            return self._get_mated_score(ply) if in_check else DRAW_SCORE
 
+        bound = EXACT if max_eval > original_alpha else UPPER_BOUND
+        self._store_entry(key, depth, max_eval, bound, best_move, ply)
         return max_eval
 
+    def _search_zero_window(self, board: chess.Board, depth: int, alpha: float, beta: float) -> float:
+        """
+        Scores the move just pushed with a zero window above alpha, searching it again with the full window
+        only when it turns out to beat alpha. Without principal variation search the full window is used directly.
+        """
+        if not self.principal_variation_search:
+            return - self.negamax(board, depth, -beta, -alpha)
+        score = - self.negamax(board, depth, -alpha - 1, -alpha)
+        if alpha < score < beta:
+            score = - self.negamax(board, depth, -beta, -alpha)
+        return score
+
+    @staticmethod
+    def _can_try_null_move(board: chess.Board, depth: int, beta: float) -> bool:
+        """
+        Passing is only tried when a plain fail-high means something, the previous move was not already
+        a pass, and the side to move keeps pieces besides pawns in a middlegame-like phase,
+        as zugzwang would make the null move observation wrong.
+        """
+        if depth < NULL_MOVE_MIN_DEPTH or abs(beta) >= CHECKMATE_SCORE:
+            return False
+        if board.move_stack and not board.move_stack[-1]:
+            return False
+        if not board.occupied_co[board.turn] & ~(board.pawns | board.kings):
+            return False
+        return PhaseEvaluator.evaluate(board) >= NULL_MOVE_MIN_PHASE
+
+    @staticmethod
+    def _get_mated_score(ply: int) -> float:
+        return -(CHECKMATE_SCORE + MAX_PLY - ply)
+
     def quiescence_search(self, board: chess.Board, alpha: float, beta: float) -> float:
         """
         Continues searching captures until the position is 'quiet'
         to avoid the horizon effect.
         """
-        stand_pat = self.evaluator.evaluate_board(board)
+        self._count_node()
+        self.stats.qnodes += 1
+        ply = len(board.move_stack) - self._root_stack_size
+
+        key = get_zobrist_hash(board)
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            cutoff = self._get_tt_cutoff(entry, alpha, beta, ply)
+            if cutoff is not None:
+                return cutoff
+
+        stand_pat, is_full_evaluation = self.evaluator.evaluate_board_lazy(board, alpha, beta)
+        self.stats.evaluations += 1
+        if not is_full_evaluation:
+            self.stats.lazy_evaluations += 1
         if stand_pat >= beta:
             return beta
+        original_alpha = alpha
         if alpha < stand_pat:
             alpha = stand_pat
 
+        best_move = None
         for move in self.order_captures(board):
-            board.push(move)
+            # A lazy stand pat is only known to be outside the window, too loose to prune captures against.
+            if self.delta_pruning and is_full_evaluation and not move.promotion and \
+                    stand_pat + self._get_captured_value(board, move) + DELTA_MARGIN <= alpha:
+                continue
+            if self.see_pruning and self._is_losing_capture(board, move):
+                continue
+
+            self._push(board, move)
             score = -self.quiescence_search(board, -beta, -alpha)
-            board.pop()
+            self._pop(board)
 
             if score >= beta:
+                self._store_entry(key, QUIESCENCE_DEPTH, beta, LOWER_BOUND, move, ply)
                 return beta
             if score > alpha:
                 alpha = score
+                best_move = move
+
+        bound = EXACT if alpha > original_alpha else UPPER_BOUND
+        self._store_entry(key, QUIESCENCE_DEPTH, alpha, bound, best_move, ply)
         return alpha
 
-    def order_moves(self, board: chess.Board) -> List[chess.Move]:
+    def pick_moves(self, board: chess.Board, tt_move: Optional[chess.Move] = None) -> Iterator[chess.Move]:
         """
-        Ranks moves to evaluate the most promising ones first.
+        Yields the legal moves in stages, each one generated and ordered only once the previous one is
+        exhausted: the transposition table move, the captures not losing material by MVV-LVA, the quiet promotions,
+        the killers, the other quiet moves by history and finally the losing captures.
+        """
+        if tt_move is not None and board.is_legal(tt_move):
+            yield tt_move
+
+        captures = [move for move in board.generate_legal_captures() if move != tt_move]
+        captures.sort(key=lambda move: self.evaluator.evaluate_move(board, move), reverse=True)
+        losing_captures = []
+        for move in captures:
+            if self._is_losing_capture(board, move):
+                losing_captures.append(move)
+            else:
+                yield move
+
+        own_pawns = board.pawns & board.occupied_co[board.turn]
+        promotions = [move for move in board.generate_legal_moves(own_pawns, chess.BB_BACKRANKS & ~board.occupied)
+                      if move != tt_move]
+        promotions.sort(key=lambda move: move.promotion, reverse=True)
+        yield from promotions
+
+        ply = len(board.move_stack) - self._root_stack_size
+        killers = [killer for killer in (self.move_history.get_killers(ply) if self.move_history is not None else [])
+                   if killer is not None and killer != tt_move]
+        for killer in killers:
+            if not board.is_capture(killer) and board.is_legal(killer):
+                yield killer
+
+        quiets = [move for move in board.generate_legal_moves(chess.BB_ALL, ~board.occupied_co[not board.turn])
+                  if not move.promotion and move != tt_move and move not in killers]
+        if board.ep_square is not None:
+            quiets = [move for move in quiets if not board.is_en_passant(move)]
+        if self.move_history is not None:
+            quiets.sort(key=lambda move: self.move_history.get_score(board, move, ply), reverse=True)
+        yield from quiets
+
+        yield from losing_captures
+
+    def order_moves(self, board: chess.Board, tt_move: Optional[chess.Move] = None) -> List[chess.Move]:
+        """
+        Ranks all the legal moves at once, to evaluate the most promising ones first.
+        The transposition table move, when legal, is searched before everything else.
+        Quiet moves, which evaluate_move scores as 0, are ranked by the killer, counter-move and history heuristics.
         """
         moves = list(board.legal_moves)
-        return sorted(moves, key=lambda move: self.evaluator.evaluate_move(board, move), reverse=True)
+        moves = sorted(moves, key=lambda move: self._get_move_score(board, move), reverse=True)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
 
     def order_captures(self, board: chess.Board) -> List[chess.Move]:
         """
@@ -100,3 +624,150 @@ class AlphaBeta:
         """
         moves = list(board.generate_legal_captures())
         return sorted(moves, key=lambda move: self.evaluator.evaluate_capture(board, move), reverse=True)
+
+    def _is_losing_capture(self, board: chess.Board, move: chess.Move) -> bool:
+        """
+        Whether the capture loses material by static exchange evaluation, which is only needed
+        when the attacker is worth more than the victim.
+        """
+        victim_value = self._get_captured_value(board, move)
+        attacker_value = PIECE_TO_VALUE.get(board.piece_type_at(move.from_square), 0.0)
+        return victim_value < attacker_value and self.evaluator.evaluate_exchange(board, move) < 0
+
+    @staticmethod
+    def _get_captured_value(board: chess.Board, move: chess.Move) -> float:
+        victim = board.piece_type_at(move.to_square)
+        if victim is None:
+            return PIECE_TO_VALUE[chess.PAWN] if board.is_en_passant(move) else 0.0
+        return PIECE_TO_VALUE.get(victim, 0.0)
+
+    def _get_move_score(self, board: chess.Board, move: chess.Move) -> float:
+        score = self.evaluator.evaluate_move(board, move)
+        if score or self.move_history is None:
+            return score
+        return self.move_history.get_score(board, move, len(board.move_stack) - self._root_stack_size)
+
+    def _store_cutoff(self, board: chess.Board, move: chess.Move, depth: int, index: int):
+        self.stats.cutoffs += 1
+        if index == 0:
+            self.stats.first_move_cutoffs += 1
+        if self.move_history is not None and not board.is_capture(move) and not move.promotion:
+            self.move_history.store_cutoff(board, move, len(board.move_stack) - self._root_stack_size, depth)
+
+    def _push(self, board: chess.Board, move: chess.Move):
+        self.evaluator.push_move(board, move)
+        board.push(move)
+
+    def _pop(self, board: chess.Board):
+        board.pop()
+        self.evaluator.pop_move(board)
+
+    def _count_node(self):
+        self.stats.nodes += 1
+        if self._max_nodes is not None and self.stats.nodes > self._max_nodes:
+            raise SearchAborted()
+        if self.stats.nodes % TIME_CHECK_INTERVAL == 0:
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                raise SearchAborted()
+            if self._stop_event is not None and self._stop_event.is_set():
+                raise SearchAborted()
+
+    def _update_principal_variation(self, board: chess.Board, depth: int):
+        """
+        Follows the best moves stored in the transposition table from the root,
+        so the next iteration searches this line first.
+        """
+        principal_variation = self._read_principal_variation(board, depth)
+        self.principal_variation = [move for _, move in principal_variation]
+        self._pv_moves = dict(principal_variation)
+
+    def _read_principal_variation(self, board: chess.Board, depth: int) -> List[Tuple[int, chess.Move]]:
+        """
+        Returns the zobrist key and best move of each position along the transposition table line.
+        """
+        principal_variation = []
+        for _ in range(depth):
+            key = get_zobrist_hash(board)
+            entry = self.transposition_table.probe(key)
+            if entry is None or entry.best_move is None or not board.is_legal(entry.best_move):
+                break
+            principal_variation.append((key, entry.best_move))
+            board.push(entry.best_move)
+
+        for _ in principal_variation:
+            board.pop()
+        return principal_variation
+
+    def _store_entry(self, key: int, depth: int, score: float, bound: int, best_move: Optional[chess.Move], ply: int):
+        self.transposition_table.store(key, depth, _to_entry_score(score, ply), bound, best_move)
+
+    @staticmethod
+    def _get_tt_cutoff(entry, alpha: float, beta: float, ply: int) -> Optional[float]:
+        score = _from_entry_score(entry.score, ply)
+        if entry.bound == EXACT:
+            return score
+        if entry.bound == LOWER_BOUND and score >= beta:
+            return beta
+        if entry.bound == UPPER_BOUND and score <= alpha:
+            return alpha
+        return None
+
+
+def _to_entry_score(score: float, ply: int) -> float:
+    """
+    Mate scores count plies from the root; the table stores them counted from the node instead,
+    so that an entry stays right when the position is reached at another ply or in a later search.
+    """
+    if score >= CHECKMATE_SCORE:
+        return score + ply
+    if score <= -CHECKMATE_SCORE:
+        return score - ply
+    return score
+
+
+def _from_entry_score(score: float, ply: int) -> float:
+    if score >= CHECKMATE_SCORE:
+        return score - ply
+    if score <= -CHECKMATE_SCORE:
+        return score + ply
+    return score
+
+
+def _search_lazy_smp_helper(setup: WorkerSetup, table: SharedTranspositionTable, helper: int, depth: int,
+                            max_time_ms: Optional[float], max_nodes: Optional[int], stop_event: Any, results: Any):
+    search = AlphaBeta(**setup.options)
+    try:
+        results.put(search._search_as_helper(setup.get_board(), table, helper, depth, max_time_ms, max_nodes,
+                                             stop_event))
+    finally:
+        table.close()
+
+
+def _receive_helper_results(helpers: List[Any], results: Any, received: List[Tuple[int, Optional[str], float]]):
+    """
+    Reads results into received until every helper has sent one or none that has not is still alive.
+    """
+    while len(received) < len(helpers):
+        # Checked before waiting: a helper that has exited has already written its result, if any.
+        any_alive = any(helper.is_alive() for helper in helpers)
+        try:
+            received.append(results.get(timeout=HELPER_RESULT_TIMEOUT))
+        except queue.Empty:
+            if not any_alive:
+                return
+
+
+def _evaluate_root_moves_chunk(setup: WorkerSetup, table: SharedTranspositionTable, root_moves: List[str], depth: int,
+                               multi_pv: Optional[int]) -> Tuple[Dict[str, float], Dict[str, List[str]]]:
+    search = AlphaBeta(**setup.options)
+    search.transposition_table = table
+    try:
+        scores = search.evaluate_root_moves(setup.get_board(), depth, multi_pv=multi_pv,
+                                            root_moves=[chess.Move.from_uci(uci) for uci in root_moves])
+    finally:
+        table.close()
+    principal_variations = {
+        move.uci(): [pv_move.uci() for pv_move in principal_variation]
+        for move, principal_variation in search.root_principal_variations.items()
+    }
+    return {move.uci(): score for move, score in scores.items()}, principal_variations
@@ -1,33 +1,375 @@
 import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Optional, Any
 
 import chess
+import numpy as np
 
-from engine.node import Node
+from engine.move_generation import get_outcome, LOSS, WIN
+from engine.search_board import SearchBoard, get_zobrist_hash
+from engine.tree import Tree, ROOT, NO_NODE, NODE_SIZE_BYTES, NO_OUTCOME
+from engine.worker_setup import WorkerSetup
 from heuristic.evaluator import Evaluator
 
+RootStats = Dict[str, Tuple[int, float]]
+
+# How many plies below the previous root a transposed position is looked up by zobrist hash.
+REUSE_HASH_SEARCH_DEPTH = 2
+
+# Fraction of the node budget kept after pruning, so that pruning does not run at every iteration.
+PRUNE_TARGET_RATIO = 0.75
+
+# Early termination is checked every EARLY_STOP_INTERVAL iterations. The search also stops once the best
+# root move and its value have not changed by more than STABLE_VALUE_TOLERANCE for STABLE_VALUE_CHECKS checks.
+EARLY_STOP_INTERVAL = 100
+STABLE_VALUE_TOLERANCE = 0.001
+STABLE_VALUE_CHECKS = 10
+
+# Sources of the PUCT move priors: Evaluator.evaluate_move, or the static evaluation one ply deeper.
+MOVE_PRIORS = 'move'
+EVAL_PRIORS = 'eval'
+# Softmax temperatures turning the scores of each source into probabilities.
+PRIOR_TEMPERATURES = {MOVE_PRIORS: 1000.0, EVAL_PRIORS: 100.0}
+
 
 class MCTS:
-    def __init__(self, evaluator: Evaluator, exploration_strength: float = 1.0, scale: float = 50.0):
+    def __init__(self, evaluator: Evaluator, exploration_strength: float = 1.0, scale: float = 50.0,
+                 batch_size: int = 1, seed: Optional[int] = None, reuse_tree: bool = False,
+                 max_nodes: Optional[int] = None, max_memory_mb: Optional[float] = None,
+                 priors: Optional[str] = None, prior_temperature: Optional[float] = None,
+                 widening: Optional[Tuple[float, float]] = None, solver: bool = False, transpositions: bool = False,
+                 use_search_board: bool = False):
+        """
+        Args:
+            max_nodes: Number of nodes above which the least visited subtrees are pruned
+            max_memory_mb: Approximate memory budget of the tree, turned into a node budget with NODE_SIZE_BYTES
+            priors: None for UCT, or MOVE_PRIORS / EVAL_PRIORS for PUCT with moves expanded by decreasing prior
+            prior_temperature: Softmax temperature of the priors, defaulting to PRIOR_TEMPERATURES[priors]
+            widening: (constant, exponent) of progressive widening, expanding a node only while it has
+                fewer than constant * visits ** exponent children; None to expand every move first
+            solver: Whether to propagate proven wins, losses and draws, stopping once the root is proven
+            transpositions: Whether to share the node of a position reached through different move orders
+            use_search_board: Whether the tree walks a SearchBoard, hashing positions incrementally
+        """
+        if priors not in (None, MOVE_PRIORS, EVAL_PRIORS):
+            raise ValueError(f"Unknown priors: {priors}")
+        if transpositions and (max_nodes is not None or max_memory_mb is not None):
+            raise ValueError("A node budget cannot be used with transpositions")
+
         self.evaluator: Evaluator = evaluator
         self.exploration_strength: float = exploration_strength
         self.scale: float = scale
+        self.batch_size: int = batch_size
+        self.seed: Optional[int] = seed
+        self.rng: Optional[random.Random] = random.Random(seed) if seed is not None else None
+        self.reuse_tree: bool = reuse_tree
+        self.tree: Optional[Tree] = None
+        self.priors: Optional[str] = priors
+        self.prior_temperature: Optional[float] = prior_temperature
+        self.widening: Optional[Tuple[float, float]] = widening
+        self.solver: bool = solver
+        self.transpositions: bool = transpositions
+        self.use_search_board: bool = use_search_board
+
+        if max_memory_mb is not None:
+            memory_nodes = int(max_memory_mb * 1024 * 1024 / NODE_SIZE_BYTES)
+            max_nodes = memory_nodes if max_nodes is None else min(max_nodes, memory_nodes)
+        self.max_nodes: Optional[int] = max_nodes
+        self.iterations: int = 0
+        self.stopped_early: bool = False
+
+    def get_best_move(self, board: chess.Board, iterations: Optional[int] = 1000, print_stats: bool = False,
+                      workers: int = 1, max_time_ms: Optional[float] = None, early_stop: bool = False) -> chess.Move:
+        """
+        Args:
+            board: The position to search
+            iterations: The maximum number of iterations, split evenly between the workers;
+                None for no limit other than max_time_ms
+            print_stats: Whether to print visits and value of every root move
+            workers: Number of processes each growing an independent tree (root parallelization)
+            max_time_ms: Wall-clock budget of the search, checked after every iteration (or batch)
+            early_stop: Whether to stop as soon as the best move can no longer change within the budget
+
+        Raises:
+            ValueError: When the game is over at board, which then has no child to play
+        """
+        if get_outcome(board, claim_draws=True) is not None:
+            raise ValueError("The game is over, there is no move to play")
+        if workers > 1:
+            return self._get_best_move_parallel(board, iterations, print_stats, workers, max_time_ms, early_stop)
+
+        tree = self.search(board, iterations, max_time_ms=max_time_ms, early_stop=early_stop)
+
+        if print_stats:
+            for child in tree.get_children(ROOT):
+                print(tree.get_move(child), tree.visits[child], tree.get_exploitation_term(child))
+
+        return tree.get_move(self._get_best_root_child(tree))
+
+    def search(self, board: chess.Board, iterations: Optional[int], max_time_ms: Optional[float] = None,
+               early_stop: bool = False) -> Tree:
+        if iterations is None and max_time_ms is None:
+            raise ValueError("Either iterations or max_time_ms must be given")
+
+        start_time = time.perf_counter()
+        deadline = start_time + max_time_ms / 1000.0 if max_time_ms is not None else None
+        tree = self._get_tree(board)
+        self.stopped_early = False
+
+        completed = 0
+        stable_checks = 0
+        previous_best = None
+        while iterations is None or completed < iterations:
+            if self.solver and tree.outcome[ROOT] != NO_OUTCOME:
+                self.stopped_early = True
+                break
+            batch_size = self.batch_size if iterations is None else min(self.batch_size, iterations - completed)
+            if batch_size == 1:
+                node = tree.select(exploration_strength=self.exploration_strength, rng=self.rng, widening=self.widening)
+                value = self.get_value(tree, node)
+                tree.reset_board()
+                tree.backpropagate(node, value, tree.selected_path)
+            else:
+                self._run_batch(tree, batch_size)
+            completed += batch_size
+
+            if self.max_nodes is not None and len(tree) > self.max_nodes:
+                tree.prune(int(self.max_nodes * PRUNE_TARGET_RATIO))
+
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+            if early_stop and completed % EARLY_STOP_INTERVAL < batch_size \
+                    and (iterations is None or completed < iterations):
+                remaining = self._get_remaining_iterations(completed, iterations, start_time, deadline)
+                if self._is_decided(tree, remaining):
+                    self.stopped_early = True
+                    break
 
-    def get_best_move(self, board: chess.Board, iterations: int = 1000, print_stats: bool = False) -> chess.Move:
-        root = Node(board)
+                best_child = self._get_best_root_child(tree)
+                best = (best_child, tree.get_exploitation_term(best_child))
+                if previous_best is not None and previous_best[0] == best[0] \
+                        and abs(previous_best[1] - best[1]) < STABLE_VALUE_TOLERANCE:
+                    stable_checks += 1
+                else:
+                    stable_checks = 0
+                previous_best = best
+                if stable_checks >= STABLE_VALUE_CHECKS:
+                    self.stopped_early = True
+                    break
 
-        for _ in range(iterations):
-            node = root.tree_policy(exploration_strength=self.exploration_strength)
-            value = self.get_value(node)
-            node.backpropagate(value)
+        self.iterations = completed
+        self.tree = tree
+        return tree
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Iterations run by the last search, whether it stopped early, and the node counters of its tree.
+        """
+        if self.tree is None:
+            return {}
+        return {'iterations': self.iterations, 'stopped_early': self.stopped_early, **self.tree.get_stats()}
+
+    @staticmethod
+    def _get_best_root_child(tree: Tree) -> int:
+        """
+        The most visited child, or a proven win when the root is solved.
+        Visits rather than mean values decide, so that _is_decided can tell when the choice is final.
+        """
+        if tree.outcome[ROOT] == WIN:
+            return next(child for child in tree.get_children(ROOT) if tree.outcome[tree.link[child]] == LOSS)
+        best_child = tree.get_most_visited_child(ROOT, skip_proven=tree.solver)
+        if best_child == NO_NODE:
+            best_child = tree.get_most_visited_child(ROOT)
+        return best_child
+
+    @staticmethod
+    def _get_remaining_iterations(completed: int, iterations: Optional[int], start_time: float,
+                                  deadline: Optional[float]) -> float:
+        """
+        Iterations left in the budget, estimating the ones that fit in the remaining time from the rate so far.
+        """
+        remaining = float('inf') if iterations is None else iterations - completed
+        if deadline is not None:
+            now = time.perf_counter()
+            rate = completed / max(now - start_time, 1e-9)
+            remaining = min(remaining, (deadline - now) * rate)
+        return remaining
+
+    @staticmethod
+    def _is_decided(tree: Tree, remaining: float) -> bool:
+        """
+        Whether the root move that would be played is ahead of every other by more visits than the budget has left.
+        """
+        if not tree.is_fully_expanded(ROOT):
+            return False
+        children = list(tree.get_children(ROOT))
+        if len(children) < 2:
+            return True
+        best_child = MCTS._get_best_root_child(tree)
+        second_visits = max(tree.visits[tree.link[child]] for child in children if child != best_child)
+        return tree.visits[tree.link[best_child]] - second_visits > remaining
+
+    def reset(self):
+        """
+        Drops the tree kept from the last search.
+        """
+        self.tree = None
+
+    def _get_tree(self, board: chess.Board) -> Tree:
+        if self.reuse_tree and self.tree is not None:
+            node = self._find_subtree(self.tree, board)
+            if node is not None:
+                return self.tree.extract_subtree(node) if node != ROOT else self.tree
+        tree_board = SearchBoard.from_board(board) if self.use_search_board else board.copy()
+        return Tree(tree_board, self.get_priors if self.priors is not None else None, self.solver,
+                    self.transpositions)
+
+    @staticmethod
+    def _find_subtree(tree: Tree, board: chess.Board) -> Optional[int]:
+        """
+        Finds the node of the previous tree reached by the moves played since its root,
+        falling back to a zobrist hash lookup in the first plies when the move stacks do not line up.
+        """
+        root_stack = tree.board.move_stack
+        stack = board.move_stack
+        if len(stack) >= len(root_stack) and stack[:len(root_stack)] == root_stack \
+                and board.root().fen() == tree.board.root().fen():
+            node = ROOT
+            for move in stack[len(root_stack):]:
+                child = next((child for child in tree.get_children(node) if tree.get_move(child) == move), None)
+                if child is None:
+                    return None
+                node = tree.link[child]
+            return node
+
+        key = get_zobrist_hash(board)
+        nodes = [ROOT]
+        for _ in range(REUSE_HASH_SEARCH_DEPTH + 1):
+            for node in nodes:
+                position = tree.board.copy()
+                for move in tree.get_path(node):
+                    position.push(move)
+                if get_zobrist_hash(position) == key:
+                    return tree.link[node]
+            nodes = [child for node in nodes for child in tree.get_children(node)]
+        return None
+
+    def get_value(self, tree: Tree, node: int) -> float:
+        """
+        Value of node, whose position must be on the tree's working board.
+        """
+        if tree.is_terminal(node):
+            return tree.outcome[node]
+        return math.tanh(self.evaluator.evaluate_board(tree.board) / self.scale)
+
+    def get_priors(self, board: chess.Board, moves: List[chess.Move]) -> List[float]:
+        """
+        Softmax of the move scores, taken from evaluate_move or from the evaluation after each move.
+        """
+        if self.priors == MOVE_PRIORS:
+            scores = [self.evaluator.evaluate_move(board, move) for move in moves]
+        else:
+            scores = []
+            for move in moves:
+                board.push(move)
+                scores.append(- self.evaluator.evaluate_board(board))
+                board.pop()
+
+        temperature = self.prior_temperature or PRIOR_TEMPERATURES[self.priors]
+        logits = np.array(scores) / temperature
+        weights = np.exp(logits - logits.max())
+        return list(weights / weights.sum())
+
+    def get_values(self, tree: Tree, nodes: List[int], boards: List[Optional[chess.Board]]) -> List[float]:
+        """
+        Values of several leaves, with all the non terminal ones scored in a single evaluate_boards call.
+        """
+        values = [float(tree.outcome[node]) if tree.is_terminal(node) else 0.0 for node in nodes]
+        pending = [i for i, node in enumerate(nodes) if not tree.is_terminal(node)]
+        if pending:
+            scores = self.evaluator.evaluate_boards([boards[i] for i in pending])
+            for i, value in zip(pending, np.tanh(scores / self.scale)):
+                values[i] = float(value)
+        return values
+
+    def _run_batch(self, tree: Tree, batch_size: int):
+        """
+        Selects batch_size leaves under virtual loss, evaluates them together and backpropagates their values.
+        """
+        leaves = []
+        paths = []
+        boards = []
+        for _ in range(batch_size):
+            node = tree.select(exploration_strength=self.exploration_strength, rng=self.rng, widening=self.widening)
+            boards.append(None if tree.is_terminal(node) else tree.board.copy(stack=False))
+            tree.reset_board()
+            tree.add_virtual_loss(node, tree.selected_path)
+            leaves.append(node)
+            paths.append(tree.selected_path)
+
+        for node, path, value in zip(leaves, paths, self.get_values(tree, leaves, boards)):
+            tree.remove_virtual_loss(node, path)
+            tree.backpropagate(node, value, path)
+
+    def _get_best_move_parallel(self, board: chess.Board, iterations: Optional[int], print_stats: bool,
+                                workers: int, max_time_ms: Optional[float], early_stop: bool) -> chess.Move:
+        """
+        Grows one tree per worker process and merges visits and values of the root children,
+        playing the most visited move overall.
+        Only a WorkerSetup and the per-worker budget cross process boundaries.
+        """
+        setup = WorkerSetup(self, board)
+        base_seed = self.seed if self.seed is not None else random.randrange(2 ** 32)
+
+        jobs = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for worker in range(workers):
+                worker_iterations = None
+                if iterations is not None:
+                    worker_iterations = iterations // workers + (1 if worker < iterations % workers else 0)
+                jobs.append(executor.submit(
+                    _search_root_stats, setup, base_seed + worker, worker_iterations, max_time_ms, early_stop
+                ))
+            results = [job.result() for job in jobs]
+
+        merged: Dict[str, List[float]] = {}
+        for root_stats in results:
+            for uci, (visits, total_value) in root_stats.items():
+                stats = merged.setdefault(uci, [0, 0.0])
+                stats[0] += visits
+                stats[1] += total_value
 
         if print_stats:
-            for child in root.children:
-                print(child.move, child.visits, child.get_exploitation_term())
+            for uci, (visits, total_value) in merged.items():
+                print(uci, visits, - total_value / visits)
+
+        best_uci = max(merged, key=lambda uci: merged[uci][0])
+        return chess.Move.from_uci(best_uci)
+
+    def _get_options(self) -> Dict[str, Any]:
+        return {
+            'evaluator': self.evaluator,
+            'exploration_strength': self.exploration_strength,
+            'scale': self.scale,
+            'batch_size': self.batch_size,
+            'max_nodes': self.max_nodes,
+            'priors': self.priors,
+            'prior_temperature': self.prior_temperature,
+            'widening': self.widening,
+            'solver': self.solver,
+            'transpositions': self.transpositions,
+            'use_search_board': self.use_search_board,
+        }
 
-        best_child = root.get_best_child(exploration_strength=0.0)
-        return best_child.move
 
-    def get_value(self, node: Node) -> float:
-        if node.is_terminal():
-            return node.outcome
-        return math.tanh(self.evaluator.evaluate_board(node.board) / self.scale)
+def _search_root_stats(setup: WorkerSetup, seed: int, iterations: Optional[int], max_time_ms: Optional[float],
+                       early_stop: bool) -> RootStats:
+    mcts = MCTS(seed=seed, **setup.options)
+    tree = mcts.search(setup.get_board(), iterations, max_time_ms=max_time_ms, early_stop=early_stop)
+    return {
+        tree.get_move(child).uci(): (tree.visits[child], tree.total_value[child])
+        for child in tree.get_children(ROOT) if tree.visits[child]
+    }
@@ -0,0 +1,39 @@
+from typing import Optional
+
+import chess
+
+LOSS = -1
+DRAW = 0
+WIN = 1
+
+
+def get_outcome(board: chess.Board, claim_draws: bool = False) -> Optional[int]:
+    """
+    Tells whether the game is over, generating at most one legal move.
+    Draws that need no move generation are checked first.
+
+    Args:
+        board: The position
+        claim_draws: Whether threefold repetition and the fifty-move rule end the game
+
+    Returns:
+        LOSS when the side to move is checkmated, DRAW for a draw and None when the game goes on
+    """
+    if board.is_insufficient_material() or (claim_draws and board.is_repetition(3)):
+        return DRAW
+    if not any(board.generate_legal_moves()):
+        return LOSS if board.is_check() else DRAW
+    if claim_draws and board.halfmove_clock >= 100:
+        return DRAW
+    return None
+
+
+def encode_move(move: chess.Move) -> int:
+    """
+    Packs a move into 16 bits: from square, to square and promotion piece type. The null move encodes to 0.
+    """
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code: int) -> chess.Move:
+    return chess.Move(code & 63, (code >> 6) & 63, (code >> 12) or None)
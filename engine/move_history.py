@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+import chess
+
+KILLER_SLOTS = 2
+
+# History scores are halved once one of them exceeds HISTORY_LIMIT, and between searches.
+HISTORY_LIMIT = 1 << 20
+
+# Ordering scores of the quiet moves, which Evaluator.evaluate_move scores as 0 while captures and
+# promotions score above it: killers first, then the counter-move, then the rest by history in [-5, -4).
+KILLER_SCORES = (-1.0, -2.0)
+COUNTER_MOVE_SCORE = -3.0
+HISTORY_SCORE_OFFSET = -5.0
+
+
+class MoveHistory:
+    """
+    Quiet move ordering heuristics learned from the beta cutoffs of a search:
+    killer moves per ply, a butterfly history table indexed by [color][from][to],
+    and the move that refuted each previous move (counter-move), indexed by its [from][to].
+    """
+
+    def __init__(self):
+        self.killers: List[List[Optional[chess.Move]]] = []
+        self.history: List[int] = [0] * (2 * 64 * 64)
+        self.counter_moves: List[Optional[chess.Move]] = [None] * (64 * 64)
+
+    def reset(self):
+        self.killers = []
+        self.history = [0] * (2 * 64 * 64)
+        self.counter_moves = [None] * (64 * 64)
+
+    def age(self):
+        """
+        Called between searches: killers are tied to the plies of the previous root and are dropped,
+        history is halved so that the new position's cutoffs soon dominate.
+        """
+        self.killers = []
+        self.history = [score >> 1 for score in self.history]
+
+    def get_killers(self, ply: int) -> List[Optional[chess.Move]]:
+        return self.killers[ply] if ply < len(self.killers) else []
+
+    def get_score(self, board: chess.Board, move: chess.Move, ply: int) -> float:
+        """
+        Ordering score of a quiet move at the given ply of the search.
+        """
+        if ply < len(self.killers):
+            killers = self.killers[ply]
+            for slot in range(KILLER_SLOTS):
+                if killers[slot] == move:
+                    return KILLER_SCORES[slot]
+        if board.move_stack:
+            previous = board.move_stack[-1]
+            if self.counter_moves[previous.from_square * 64 + previous.to_square] == move:
+                return COUNTER_MOVE_SCORE
+        return HISTORY_SCORE_OFFSET + self.history[self._get_history_index(board.turn, move)] / HISTORY_LIMIT
+
+    def store_cutoff(self, board: chess.Board, move: chess.Move, ply: int, depth: int):
+        """
+        Records a quiet move that caused a beta cutoff at the given ply and remaining depth.
+        """
+        while len(self.killers) <= ply:
+            self.killers.append([None] * KILLER_SLOTS)
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1:] = killers[:-1]
+            killers[0] = move
+
+        index = self._get_history_index(board.turn, move)
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_LIMIT:
+            self.history = [score >> 1 for score in self.history]
+
+        if board.move_stack:
+            previous = board.move_stack[-1]
+            self.counter_moves[previous.from_square * 64 + previous.to_square] = move
+
+    @staticmethod
+    def _get_history_index(color: chess.Color, move: chess.Move) -> int:
+        return (int(color) * 64 + move.from_square) * 64 + move.to_square
@@ -0,0 +1,122 @@
+from typing import List, Tuple, Union
+
+import chess
+import chess.polyglot
+
+_HASHER = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+_PIECE_KEYS = chess.polyglot.POLYGLOT_RANDOM_ARRAY[:768]
+_TURN_KEY = chess.polyglot.POLYGLOT_RANDOM_ARRAY[780]
+
+
+class SearchBoard(chess.Board):
+    """
+    Board for the search hot loop, keeping its polyglot zobrist hash up to date in push and pop instead of
+    recomputing it from all the pieces at every node.
+
+    Push diffs the piece bitboards around the python-chess move, which covers captures, castling, en passant
+    and promotions alike. Castling and en passant keys are only recomputed when the move changes them.
+    The keys of the moves pushed since the conversion are the only extra undo state; popping a move pushed
+    before falls back to a full hash.
+
+    The key only follows push and pop: other ways of editing the position (set_fen, set_piece_at, ...)
+    leave it stale until refresh_zobrist_hash is called.
+    """
+
+    def __init__(self, fen: Union[str, None] = chess.STARTING_FEN, *, chess960: bool = False):
+        super().__init__(fen, chess960=chess960)
+        self.refresh_zobrist_hash()
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> "SearchBoard":
+        """
+        Copies board with its move stack, at the cost of a single full hash.
+        """
+        search_board = cls(None, chess960=board.chess960)
+        _copy_position(board, search_board)
+        search_board.refresh_zobrist_hash()
+        return search_board
+
+    def refresh_zobrist_hash(self):
+        self.zobrist_key: int = chess.polyglot.zobrist_hash(self)
+        self._castling_key: int = _HASHER.hash_castling(self)
+        self._ep_key: int = _HASHER.hash_ep_square(self)
+        self._key_stack: List[Tuple[int, int, int]] = []
+
+    def push(self, move: chess.Move):
+        pieces = self._get_piece_masks()
+        castling_rights = self.castling_rights
+        self._key_stack.append((self.zobrist_key, self._castling_key, self._ep_key))
+        super().push(move)
+
+        key = self.zobrist_key ^ self._castling_key ^ self._ep_key ^ _TURN_KEY
+        for index, (before, after) in enumerate(zip(pieces, self._get_piece_masks())):
+            for square in chess.scan_forward(before ^ after):
+                key ^= _PIECE_KEYS[64 * index + square]
+        if self.castling_rights != castling_rights:
+            self._castling_key = _HASHER.hash_castling(self)
+        self._ep_key = _HASHER.hash_ep_square(self) if self.ep_square is not None else 0
+        self.zobrist_key = key ^ self._castling_key ^ self._ep_key
+
+    def pop(self) -> chess.Move:
+        move = super().pop()
+        if self._key_stack:
+            self.zobrist_key, self._castling_key, self._ep_key = self._key_stack.pop()
+        else:
+            self.refresh_zobrist_hash()
+        return move
+
+    def copy(self, *, stack: Union[bool, int] = True) -> "SearchBoard":
+        board = super().copy(stack=stack)
+        board.zobrist_key = self.zobrist_key
+        board._castling_key = self._castling_key
+        board._ep_key = self._ep_key
+        if stack:
+            stack = len(self.move_stack) if stack is True else stack
+            board._key_stack = self._key_stack[-stack:]
+        return board
+
+    def root(self) -> "SearchBoard":
+        board = super().root()
+        board.refresh_zobrist_hash()
+        return board
+
+    def _get_piece_masks(self) -> Tuple[int, ...]:
+        """
+        Bitboards of every piece type and color, in polyglot order: black pawns, white pawns, black knights...
+        """
+        black, white = self.occupied_co
+        return (
+            self.pawns & black, self.pawns & white, self.knights & black, self.knights & white,
+            self.bishops & black, self.bishops & white, self.rooks & black, self.rooks & white,
+            self.queens & black, self.queens & white, self.kings & black, self.kings & white,
+        )
+
+
+def get_zobrist_hash(board: chess.Board) -> int:
+    """
+    The polyglot zobrist hash of board, read from a SearchBoard and computed from scratch otherwise.
+    """
+    if isinstance(board, SearchBoard):
+        return board.zobrist_key
+    return chess.polyglot.zobrist_hash(board)
+
+
+def _copy_position(source: chess.Board, target: chess.Board):
+    target.pawns = source.pawns
+    target.knights = source.knights
+    target.bishops = source.bishops
+    target.rooks = source.rooks
+    target.queens = source.queens
+    target.kings = source.kings
+    target.occupied_co[chess.WHITE] = source.occupied_co[chess.WHITE]
+    target.occupied_co[chess.BLACK] = source.occupied_co[chess.BLACK]
+    target.occupied = source.occupied
+    target.promoted = source.promoted
+
+    target.ep_square = source.ep_square
+    target.castling_rights = source.castling_rights
+    target.turn = source.turn
+    target.fullmove_number = source.fullmove_number
+    target.halfmove_clock = source.halfmove_clock
+    target.move_stack = source.move_stack.copy()
+    target._stack = source._stack.copy()
@@ -0,0 +1,30 @@
+from typing import Dict
+
+
+class SearchStats:
+    """
+    Counters collected by AlphaBeta during a single get_best_move call.
+    """
+    __slots__ = ('nodes', 'qnodes', 'depth', 'score', 'elapsed_ms', 'aborted', 'evaluations', 'lazy_evaluations',
+                 'cutoffs', 'first_move_cutoffs')
+
+    def __init__(self):
+        self.nodes: int = 0
+        self.qnodes: int = 0
+        self.depth: int = 0
+        self.score: float = 0.0
+        self.elapsed_ms: float = 0.0
+        self.aborted: bool = False
+        self.evaluations: int = 0
+        self.lazy_evaluations: int = 0
+        self.cutoffs: int = 0
+        self.first_move_cutoffs: int = 0
+
+    def get_first_move_cutoff_rate(self) -> float:
+        """
+        Fraction of the beta cutoffs of interior nodes caused by the first move searched.
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.__slots__}
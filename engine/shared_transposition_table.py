@@ -0,0 +1,116 @@
+import struct
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import chess
+
+from engine.move_generation import encode_move, decode_move
+from engine.transposition_table import BaseTranspositionTable, TTEntry, DEFAULT_SIZE_MB, BUCKET_SIZE
+
+# Each slot is three 64-bit words: key ^ data ^ score, data and score.
+SLOT_WORDS = 3
+WORD_SIZE_BYTES = 8
+
+# Layout of the data word. The valid bit tells a written slot from a zeroed one.
+DEPTH_BITS = 8
+BOUND_SHIFT = DEPTH_BITS
+MOVE_SHIFT = BOUND_SHIFT + 2
+VALID_BIT = 1 << (MOVE_SHIFT + 16)
+
+MAX_STORED_DEPTH = (1 << DEPTH_BITS) - 1
+
+_SCORE = struct.Struct('<d')
+_WORD = struct.Struct('<Q')
+
+
+class SharedTranspositionTable(BaseTranspositionTable):
+    """
+    Transposition table with the same interface and replacement scheme as TranspositionTable, stored in
+    a shared memory block that the processes of a parallel search read and write without locking.
+
+    An entry is written as three independent words, the first one being the key xor-ed with the other two.
+    When two processes write the same slot at once, or one reads while another writes, the words no longer
+    match the key and the slot reads as empty instead of returning a mix of both entries.
+
+    Pickling only carries the block name, so a worker process attaches to the same memory.
+    The creating process calls unlink once every process has called close.
+    """
+
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB, name: Optional[str] = None,
+                 num_buckets: Optional[int] = None):
+        super().__init__()
+        slot_size_bytes = SLOT_WORDS * WORD_SIZE_BYTES
+        if num_buckets is None:
+            num_buckets = max(1, int(size_mb * 1024 * 1024) // (slot_size_bytes * BUCKET_SIZE))
+        self.num_buckets: int = num_buckets
+        if name is None:
+            self.memory: SharedMemory = SharedMemory(create=True, size=num_buckets * BUCKET_SIZE * slot_size_bytes)
+            self.memory.buf[:] = bytes(len(self.memory.buf))
+        else:
+            self.memory = SharedMemory(name=name)
+        self.words: memoryview = self.memory.buf.cast('Q')
+
+    def __getstate__(self):
+        return {'name': self.memory.name, 'num_buckets': self.num_buckets}
+
+    def __setstate__(self, state):
+        self.__init__(name=state['name'], num_buckets=state['num_buckets'])
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        index = (key % self.num_buckets) * BUCKET_SIZE * SLOT_WORDS
+        occupied = False
+        for offset in range(index, index + BUCKET_SIZE * SLOT_WORDS, SLOT_WORDS):
+            checksum, data, score_bits = self.words[offset:offset + SLOT_WORDS]
+            if not data & VALID_BIT:
+                continue
+            if checksum ^ data ^ score_bits == key:
+                self.hits += 1
+                return _unpack_entry(key, data, score_bits)
+            occupied = True
+
+        self._count_miss(occupied)
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: Optional[chess.Move]):
+        index = (key % self.num_buckets) * BUCKET_SIZE * SLOT_WORDS
+        checksum, data, score_bits = self.words[index:index + SLOT_WORDS]
+        same_key = bool(data & VALID_BIT) and checksum ^ data ^ score_bits == key
+        if not data & VALID_BIT or same_key or depth >= data & MAX_STORED_DEPTH:
+            self._write(index, key, depth, score, bound, best_move, data if same_key else 0)
+            return
+
+        index += SLOT_WORDS
+        checksum, data, score_bits = self.words[index:index + SLOT_WORDS]
+        same_key = bool(data & VALID_BIT) and checksum ^ data ^ score_bits == key
+        self._write(index, key, depth, score, bound, best_move, data if same_key else 0)
+
+    def _write(self, index: int, key: int, depth: int, score: float, bound: int,
+               best_move: Optional[chess.Move], previous_data: int):
+        move_code = encode_move(best_move) if best_move is not None else (previous_data >> MOVE_SHIFT) & 0xFFFF
+        data = VALID_BIT | (move_code << MOVE_SHIFT) | (bound << BOUND_SHIFT) | min(max(depth, 0), MAX_STORED_DEPTH)
+        score_bits = _WORD.unpack(_SCORE.pack(score))[0]
+        self.words[index] = key ^ data ^ score_bits
+        self.words[index + 1] = data
+        self.words[index + 2] = score_bits
+
+    def _clear_slots(self):
+        self.memory.buf[:] = bytes(len(self.memory.buf))
+
+    def close(self):
+        """
+        Detaches this process from the shared memory.
+        """
+        self.words.release()
+        self.memory.close()
+
+    def unlink(self):
+        """
+        Frees the shared memory; called once by the process that created the table.
+        """
+        self.memory.unlink()
+
+
+def _unpack_entry(key: int, data: int, score_bits: int) -> TTEntry:
+    move_code = (data >> MOVE_SHIFT) & 0xFFFF
+    return TTEntry(key, data & MAX_STORED_DEPTH, _SCORE.unpack(_WORD.pack(score_bits))[0],
+                   (data >> BOUND_SHIFT) & 3, decode_move(move_code) if move_code else None)
@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from typing import Optional, List, Dict
+
+import chess
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+DEFAULT_SIZE_MB = 16
+
+# Rough footprint of one slot: the entry object, its key int and the list pointer.
+ENTRY_SIZE_BYTES = 128
+
+# Each bucket holds a depth-preferred slot followed by an always-replace slot.
+BUCKET_SIZE = 2
+
+
+class TTEntry:
+    __slots__ = ('key', 'depth', 'score', 'bound', 'best_move')
+
+    def __init__(self, key: int, depth: int, score: float, bound: int, best_move: Optional[chess.Move]):
+        self.key = key
+        self.depth = depth
+        self.score = score
+        self.bound = bound
+        self.best_move = best_move
+
+
+class BaseTranspositionTable(ABC):
+    """
+    Probe and store interface of the transposition tables, with the probe counters they share.
+    """
+
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.collisions: int = 0
+
+    @abstractmethod
+    def probe(self, key: int) -> Optional[TTEntry]:
+        pass
+
+    @abstractmethod
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: Optional[chess.Move]):
+        pass
+
+    @abstractmethod
+    def _clear_slots(self):
+        pass
+
+    def clear(self):
+        self._clear_slots()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'hit_rate': self.hits / probes if probes else 0.0
+        }
+
+    def _count_miss(self, occupied: bool):
+        """
+        Counts a failed probe, also a collision when another position holds a slot of the bucket.
+        """
+        self.misses += 1
+        if occupied:
+            self.collisions += 1
+
+
+class TranspositionTable(BaseTranspositionTable):
+    """
+    Bounded hash table of search results keyed on the polyglot zobrist hash.
+
+    Every bucket has two slots: the first one keeps the deepest result seen for its index,
+    the second one is overwritten by every store that does not qualify for the first.
+    """
+
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB):
+        super().__init__()
+        self.num_buckets: int = max(1, int(size_mb * 1024 * 1024) // (ENTRY_SIZE_BYTES * BUCKET_SIZE))
+        self.slots: List[Optional[TTEntry]] = [None] * (self.num_buckets * BUCKET_SIZE)
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        index = (key % self.num_buckets) * BUCKET_SIZE
+        occupied = False
+        for slot in range(index, index + BUCKET_SIZE):
+            entry = self.slots[slot]
+            if entry is None:
+                continue
+            if entry.key == key:
+                self.hits += 1
+                return entry
+            occupied = True
+
+        self._count_miss(occupied)
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: Optional[chess.Move]):
+        index = (key % self.num_buckets) * BUCKET_SIZE
+        preferred = self.slots[index]
+        if preferred is None or preferred.key == key or depth >= preferred.depth:
+            if best_move is None and preferred is not None and preferred.key == key:
+                best_move = preferred.best_move
+            self.slots[index] = TTEntry(key, depth, score, bound, best_move)
+            return
+
+        replaced = self.slots[index + 1]
+        if best_move is None and replaced is not None and replaced.key == key:
+            best_move = replaced.best_move
+        self.slots[index + 1] = TTEntry(key, depth, score, bound, best_move)
+
+    def _clear_slots(self):
+        self.slots = [None] * (self.num_buckets * BUCKET_SIZE)
@@ -0,0 +1,544 @@
+import math
+import random
+import sys
+from array import array
+from typing import Optional, Iterator, List, Dict, Set, Callable, Tuple
+
+import chess
+
+from engine.move_generation import get_outcome, encode_move, decode_move, LOSS, WIN
+from engine.search_board import get_zobrist_hash
+
+NO_NODE = -1
+FREE_NODE = -2
+ROOT = 0
+
+NO_OUTCOME = 2
+UNKNOWN_NUM_MOVES = 0xFFFF
+
+# Average bytes per node, from get_memory_usage after 4000 iterations on the benchmark positions with UCT,
+# PUCT and progressive widening: 54 to 141 bytes, the parallel arrays taking 41 and the untried moves and
+# priors of partially expanded nodes the rest. Rounded up, but a budget converted with it stays approximate.
+NODE_SIZE_BYTES = 160
+
+# Maps a position and its legal moves to one prior probability per move.
+PriorFunction = Callable[[chess.Board, List[chess.Move]], List[float]]
+
+
+class Tree:
+    """
+    MCTS tree stored as parallel arrays indexed by node, without any per-node board.
+
+    Children are linked through first_child / next_sibling in expansion order. A node is fully
+    expanded once it has num_moves children; its legal moves are only generated when it is first
+    expanded, and kept in untried_moves until the last one is expanded. The position of a node is
+    rebuilt by replaying the moves from the root on the working board, which the search keeps in
+    sync with the selected node. Values are from the point of view of the side to move at the node.
+
+    Pruned subtrees give their slots back to a free list, which new nodes take before growing the arrays;
+    the root of a pruned subtree keeps its statistics and is expanded again from scratch when reached.
+
+    With a prior_function, moves are expanded from the highest prior down and selection uses PUCT.
+
+    As a solver, the outcome of a node is also set once it is proven: a win as soon as one child is
+    a loss for the opponent, otherwise the best outcome for the side to move once every child is proven.
+    Selection never enters children proven won or lost, since their value is already known, except for a
+    child proven lost through another parent of a transposition, which it enters once to prove this parent.
+
+    With transpositions, the tree becomes a DAG: a move reaching a position already in the tree at the
+    same depth adds a link node, whose link points to the node holding the position, its statistics and
+    its children. Every other node links to itself. Parent pointers then only give one of the paths to a
+    node, so select records the path it took in selected_path, which must be passed to the backpropagation.
+    """
+
+    def __init__(self, board: chess.Board, prior_function: Optional[PriorFunction] = None, solver: bool = False,
+                 transpositions: bool = False):
+        self.board: chess.Board = board
+        self.root_stack_size: int = len(board.move_stack)
+        self.prior_function: Optional[PriorFunction] = prior_function
+        self.solver: bool = solver
+        self.positions: Optional[Dict[int, int]] = {} if transpositions else None
+        self.selected_path: Optional[List[int]] = None
+
+        self.parent = array('i')
+        self.move = array('H')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.num_children = array('H')
+        self.num_moves = array('H')
+        self.outcome = array('b')
+        self.visits = array('I')
+        self.total_value = array('d')
+        self.virtual_loss = array('H')
+        self.prior = array('f')
+        self.link = array('i')
+        self.untried_moves: Dict[int, array] = {}
+        self.untried_priors: Dict[int, array] = {}
+
+        self.free_nodes: List[int] = []
+        self.pruned_nodes: Set[int] = set()
+        self.nodes_allocated: int = 0
+        self.nodes_pruned: int = 0
+        self.nodes_reexpanded: int = 0
+        self.transpositions_found: int = 0
+
+        root = self._add_node(NO_NODE, 0, board)
+        if self.positions is not None:
+            self.positions[get_zobrist_hash(board)] = root
+
+    def __len__(self) -> int:
+        return len(self.parent) - len(self.free_nodes)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'nodes': len(self),
+            'nodes_allocated': self.nodes_allocated,
+            'nodes_pruned': self.nodes_pruned,
+            'nodes_reexpanded': self.nodes_reexpanded,
+            'transpositions': self.transpositions_found,
+            'memory_bytes': self.get_memory_usage(),
+        }
+
+    def get_memory_usage(self) -> int:
+        """
+        Returns the bytes held by the tree: node arrays, untried moves and priors, pruned and free node
+        bookkeeping and the transposition index, containers included.
+        """
+        arrays = [self.parent, self.move, self.first_child, self.next_sibling, self.num_children,
+                  self.num_moves, self.outcome, self.visits, self.total_value, self.virtual_loss, self.prior,
+                  self.link]
+        arrays.extend(self.untried_moves.values())
+        arrays.extend(self.untried_priors.values())
+        containers = [self.untried_moves, self.untried_priors, self.pruned_nodes, self.free_nodes]
+        if self.positions is not None:
+            containers.append(self.positions)
+        return sum(sys.getsizeof(container) for container in arrays + containers)
+
+    def is_terminal(self, node: int) -> bool:
+        return self.outcome[node] != NO_OUTCOME
+
+    def is_fully_expanded(self, node: int) -> bool:
+        return self.num_children[node] >= self.num_moves[node]
+
+    def get_move(self, node: int) -> chess.Move:
+        return decode_move(self.move[node])
+
+    def get_children(self, node: int) -> Iterator[int]:
+        child = self.first_child[node]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def get_exploitation_term(self, node: int) -> float:
+        virtual_loss = self.virtual_loss[node]
+        if not virtual_loss:
+            return - self.total_value[node] / self.visits[node]
+        return - (self.total_value[node] + virtual_loss) / (self.visits[node] + virtual_loss)
+
+    def get_best_child(self, node: int, exploration_strength: float = 1.0, skip_proven: bool = False) -> int:
+        parent_visits = self.visits[node] + self.virtual_loss[node]
+        parent_log_visits = math.log(parent_visits) if parent_visits else 0.0
+
+        visits = self.visits
+        total_value = self.total_value
+        virtual_loss = self.virtual_loss
+        outcome = self.outcome
+        link = self.link
+        next_sibling = self.next_sibling
+
+        best_child = NO_NODE
+        best_score = -float('inf')
+        child = self.first_child[node]
+        while child != NO_NODE:
+            stats = link[child]
+            if skip_proven and abs(outcome[stats]) == WIN:
+                if outcome[stats] == LOSS:
+                    # Proven through another parent of a transposition: selecting it proves this node too.
+                    return child
+                child = next_sibling[child]
+                continue
+            child_virtual_loss = virtual_loss[stats]
+            child_visits = visits[stats] + child_virtual_loss
+            exploitation = - (total_value[stats] + child_virtual_loss) / child_visits
+            score = exploitation + exploration_strength * math.sqrt(parent_log_visits / child_visits)
+            if score > best_score:
+                best_score = score
+                best_child = child
+            child = next_sibling[child]
+        return best_child
+
+    def get_best_child_puct(self, node: int, exploration_strength: float = 1.0, skip_proven: bool = False) -> int:
+        sqrt_parent_visits = math.sqrt(self.visits[node] + self.virtual_loss[node])
+
+        visits = self.visits
+        total_value = self.total_value
+        virtual_loss = self.virtual_loss
+        outcome = self.outcome
+        prior = self.prior
+        link = self.link
+        next_sibling = self.next_sibling
+
+        best_child = NO_NODE
+        best_score = -float('inf')
+        child = self.first_child[node]
+        while child != NO_NODE:
+            stats = link[child]
+            if skip_proven and abs(outcome[stats]) == WIN:
+                if outcome[stats] == LOSS:
+                    # Proven through another parent of a transposition: selecting it proves this node too.
+                    return child
+                child = next_sibling[child]
+                continue
+            child_virtual_loss = virtual_loss[stats]
+            child_visits = visits[stats] + child_virtual_loss
+            exploitation = - (total_value[stats] + child_virtual_loss) / child_visits if child_visits else 0.0
+            score = exploitation + exploration_strength * prior[child] * sqrt_parent_visits / (1 + child_visits)
+            if score > best_score:
+                best_score = score
+                best_child = child
+            child = next_sibling[child]
+        return best_child
+
+    def get_most_visited_child(self, node: int, skip_proven: bool = False) -> int:
+        best_child = NO_NODE
+        best_visits = -1
+        for child in self.get_children(node):
+            stats = self.link[child]
+            if skip_proven and abs(self.outcome[stats]) == WIN:
+                continue
+            if self.visits[stats] > best_visits:
+                best_visits = self.visits[stats]
+                best_child = child
+        return best_child
+
+    def select(self, exploration_strength: float = 1.0, rng: Optional[random.Random] = None,
+               widening: Optional[Tuple[float, float]] = None) -> int:
+        """
+        Descends from the root with UCT (PUCT with priors), expanding the first node that is not fully expanded.
+        The working board is left on the returned node; reset_board brings it back to the root.
+
+        With widening = (constant, exponent), a node only gets a new child while it has fewer than
+        constant * visits ** exponent children (progressive widening).
+        """
+        get_best_child = self.get_best_child if self.prior_function is None else self.get_best_child_puct
+        path = [ROOT] if self.positions is not None else None
+        self.selected_path = path
+        node = ROOT
+        while self.outcome[node] == NO_OUTCOME:
+            num_children = self.num_children[node]
+            can_expand = num_children < self.num_moves[node] and \
+                (widening is None or num_children < max(1, int(widening[0] * self.visits[node] ** widening[1])))
+            child = NO_NODE if can_expand else get_best_child(node, exploration_strength, self.solver)
+            if child == NO_NODE and self.is_fully_expanded(node):
+                # Every move leads to a win proven through another parent, which the proof did not reach.
+                self.outcome[node] = LOSS
+                break
+            if child == NO_NODE:
+                # Also reached when every child so far is proven but the node is not: widen regardless of its visits.
+                node = self.expand(node, rng)
+            else:
+                self.board.push(decode_move(self.move[child]))
+                node = self.link[child]
+            if path is not None:
+                path.append(node)
+            if child == NO_NODE:
+                break
+        return node
+
+    def expand(self, node: int, rng: Optional[random.Random] = None) -> int:
+        """
+        Adds the next untried move of node (the working board must be on node) and moves the board to the child.
+        Untried moves are taken from the end of the legal move list, or at random when rng is given.
+        With a prior_function they are taken by decreasing prior, rng only breaking ties.
+        Returns the node holding the child position, which differs from the added one for a transposition.
+        """
+        untried_moves = self.untried_moves.get(node)
+        if untried_moves is None:
+            if node in self.pruned_nodes:
+                self.pruned_nodes.remove(node)
+                self.nodes_reexpanded += 1
+            if self.prior_function is None:
+                untried_moves = array('H', [encode_move(move) for move in self.board.legal_moves])
+            else:
+                untried_moves = self._get_moves_by_prior(node, rng)
+            self.untried_moves[node] = untried_moves
+            self.num_moves[node] = len(untried_moves)
+
+        prior = 0.0
+        if self.prior_function is not None:
+            untried_priors = self.untried_priors[node]
+            prior = untried_priors.pop()
+            if not untried_priors:
+                del self.untried_priors[node]
+        elif rng is not None:
+            index = rng.randrange(len(untried_moves))
+            untried_moves[index], untried_moves[-1] = untried_moves[-1], untried_moves[index]
+        move_code = untried_moves.pop()
+        if not untried_moves:
+            del self.untried_moves[node]
+
+        self.board.push(decode_move(move_code))
+        position = self._find_transposition(node) if self.positions is not None else NO_NODE
+        child = self._add_node(node, move_code, self.board, prior, position)
+        if self.positions is not None and position == NO_NODE:
+            self.positions.setdefault(get_zobrist_hash(self.board), child)
+
+        last_child = self.first_child[node]
+        if last_child == NO_NODE:
+            self.first_child[node] = child
+        else:
+            while self.next_sibling[last_child] != NO_NODE:
+                last_child = self.next_sibling[last_child]
+            self.next_sibling[last_child] = child
+        self.num_children[node] += 1
+        return self.link[child]
+
+    def _find_transposition(self, parent: int) -> int:
+        """
+        Returns the node already holding the working board position one ply below parent, or NO_NODE.
+        Only nodes at the same depth are linked, which keeps the graph free of cycles.
+        """
+        node = self.positions.get(get_zobrist_hash(self.board), NO_NODE)
+        if node == NO_NODE or self._get_depth(node) != self._get_depth(parent) + 1:
+            return NO_NODE
+        self.transpositions_found += 1
+        return node
+
+    def _get_depth(self, node: int) -> int:
+        depth = 0
+        while node != ROOT:
+            node = self.parent[node]
+            depth += 1
+        return depth
+
+    def _get_moves_by_prior(self, node: int, rng: Optional[random.Random]) -> array:
+        """
+        Generates the legal moves of node in increasing prior order, so that they are popped best first.
+        """
+        moves = list(self.board.legal_moves)
+        if rng is not None:
+            rng.shuffle(moves)
+        priors = self.prior_function(self.board, moves) if moves else []
+        order = sorted(range(len(moves)), key=lambda i: priors[i])
+        if moves:
+            self.untried_priors[node] = array('f', [priors[i] for i in order])
+        return array('H', [encode_move(moves[i]) for i in order])
+
+    def reset_board(self):
+        while len(self.board.move_stack) > self.root_stack_size:
+            self.board.pop()
+
+    def backpropagate(self, node: int, value: float, path: Optional[List[int]] = None):
+        """
+        Adds value to node and, negated at every ply, to its ancestors: those of path when given
+        (the selected_path of a transposition-aware tree), otherwise the ones found through parent pointers.
+        """
+        if self.solver:
+            self.propagate_proof(node, path)
+        for node in self._get_ancestors(node, path):
+            self.visits[node] += 1
+            self.total_value[node] += value
+            value = -value
+
+    def propagate_proof(self, node: int, path: Optional[List[int]] = None):
+        """
+        Proves the ancestors of node that its outcome decides.
+        """
+        ancestors = self._get_ancestors(node, path)
+        next(ancestors)
+        for parent in ancestors:
+            if self.outcome[node] == NO_OUTCOME or self.outcome[parent] != NO_OUTCOME:
+                return
+            if self.outcome[node] == LOSS:
+                self.outcome[parent] = WIN
+            elif self.is_fully_expanded(parent):
+                outcomes = [self.outcome[self.link[child]] for child in self.get_children(parent)]
+                if NO_OUTCOME in outcomes:
+                    return
+                self.outcome[parent] = - min(outcomes)
+            else:
+                return
+            node = parent
+
+    def add_virtual_loss(self, node: int, path: Optional[List[int]] = None):
+        for node in self._get_ancestors(node, path):
+            self.virtual_loss[node] += 1
+
+    def remove_virtual_loss(self, node: int, path: Optional[List[int]] = None):
+        for node in self._get_ancestors(node, path):
+            self.virtual_loss[node] -= 1
+
+    def _get_ancestors(self, node: int, path: Optional[List[int]]) -> Iterator[int]:
+        """
+        Yields node and then its ancestors up to the root.
+        """
+        if path is not None:
+            yield from reversed(path)
+            return
+        while node != NO_NODE:
+            yield node
+            node = self.parent[node]
+
+    def prune(self, max_nodes: int):
+        """
+        Collapses the least visited subtrees back into unexpanded nodes until at most max_nodes are in use.
+        Must not be called while virtual losses are pending.
+        """
+        candidates = [node for node in range(1, len(self.parent))
+                      if self.first_child[node] != NO_NODE and self.parent[node] != FREE_NODE]
+        candidates.sort(key=lambda node: self.visits[node])
+        for node in candidates:
+            if len(self) <= max_nodes:
+                break
+            if self.parent[node] != FREE_NODE:
+                self._collapse(node)
+
+    def get_path(self, node: int) -> List[chess.Move]:
+        """
+        Returns the moves leading from the root to node.
+        """
+        moves = []
+        while node != ROOT:
+            moves.append(decode_move(self.move[node]))
+            node = self.parent[node]
+        moves.reverse()
+        return moves
+
+    def extract_subtree(self, node: int) -> "Tree":
+        """
+        Returns a new tree rooted at node, with the statistics of its whole subtree.
+        A link node whose position lies outside the subtree takes over the position, without its children.
+        """
+        board = self.board.copy()
+        for move in self.get_path(node):
+            board.push(move)
+
+        subtree = Tree.__new__(Tree)
+        subtree.board = board
+        subtree.root_stack_size = len(board.move_stack)
+        subtree.prior_function = self.prior_function
+        subtree.solver = self.solver
+        subtree.selected_path = None
+        for name in ['parent', 'move', 'first_child', 'next_sibling', 'num_children',
+                     'num_moves', 'outcome', 'visits', 'total_value', 'virtual_loss', 'prior', 'link']:
+            setattr(subtree, name, array(getattr(self, name).typecode))
+        subtree.untried_moves = {}
+        subtree.untried_priors = {}
+        subtree.free_nodes = []
+        subtree.pruned_nodes = set()
+        subtree.nodes_pruned = 0
+        subtree.nodes_reexpanded = 0
+        subtree.transpositions_found = 0
+
+        new_nodes: Dict[int, int] = {}
+        links: List[int] = []
+        pending = [(node, NO_NODE)]
+        while pending:
+            old_node, new_parent = pending.pop()
+            new_node = len(subtree.parent)
+            new_nodes[old_node] = new_node
+            subtree.link.append(new_node)
+            if self.link[old_node] != old_node:
+                links.append(new_node)
+            subtree.parent.append(new_parent)
+            subtree.move.append(self.move[old_node])
+            subtree.first_child.append(NO_NODE)
+            subtree.next_sibling.append(NO_NODE)
+            subtree.num_children.append(self.num_children[old_node])
+            subtree.num_moves.append(self.num_moves[old_node])
+            subtree.outcome.append(self.outcome[old_node])
+            subtree.visits.append(self.visits[old_node])
+            subtree.total_value.append(self.total_value[old_node])
+            subtree.virtual_loss.append(0)
+            subtree.prior.append(self.prior[old_node])
+            if old_node in self.untried_moves:
+                subtree.untried_moves[new_node] = array('H', self.untried_moves[old_node])
+            if old_node in self.untried_priors:
+                subtree.untried_priors[new_node] = array('f', self.untried_priors[old_node])
+            if old_node in self.pruned_nodes:
+                subtree.pruned_nodes.add(new_node)
+
+            if new_parent != NO_NODE:
+                siblings = subtree.first_child[new_parent]
+                subtree.next_sibling[new_node] = siblings
+                subtree.first_child[new_parent] = new_node
+
+            # Children are popped last first and prepended, which keeps their expansion order.
+            for child in self.get_children(old_node):
+                pending.append((child, new_node))
+        subtree.nodes_allocated = len(subtree.parent)
+
+        subtree.positions = None
+        if self.positions is not None:
+            keys = {position: key for key, position in self.positions.items()}
+            subtree.positions = {keys[old_node]: new_node for old_node, new_node in new_nodes.items()
+                                 if old_node in keys}
+            old_nodes = {new_node: old_node for old_node, new_node in new_nodes.items()}
+            for new_node in links:
+                old_position = self.link[old_nodes[new_node]]
+                if old_position not in new_nodes:
+                    new_nodes[old_position] = new_node
+                    subtree.positions[keys[old_position]] = new_node
+                    subtree.num_moves[new_node] = 0 if self.outcome[old_position] != NO_OUTCOME else UNKNOWN_NUM_MOVES
+                    subtree.outcome[new_node] = self.outcome[old_position]
+                    subtree.visits[new_node] = self.visits[old_position]
+                    subtree.total_value[new_node] = self.total_value[old_position]
+                subtree.link[new_node] = new_nodes[old_position]
+        return subtree
+
+    def _collapse(self, node: int):
+        pending = list(self.get_children(node))
+        while pending:
+            child = pending.pop()
+            pending.extend(self.get_children(child))
+            self.parent[child] = FREE_NODE
+            self.untried_moves.pop(child, None)
+            self.untried_priors.pop(child, None)
+            self.pruned_nodes.discard(child)
+            self.free_nodes.append(child)
+            self.nodes_pruned += 1
+
+        self.first_child[node] = NO_NODE
+        self.num_children[node] = 0
+        self.num_moves[node] = UNKNOWN_NUM_MOVES
+        self.untried_moves.pop(node, None)
+        self.untried_priors.pop(node, None)
+        self.pruned_nodes.add(node)
+
+    def _add_node(self, parent: int, move_code: int, board: chess.Board, prior: float = 0.0,
+                  link: int = NO_NODE) -> int:
+        """
+        Adds a node for the board position, or a link node to the one given by link.
+        """
+        outcome = get_outcome(board, claim_draws=True) if link == NO_NODE else None
+        self.nodes_allocated += 1
+        if self.free_nodes:
+            node = self.free_nodes.pop()
+            self.parent[node] = parent
+            self.move[node] = move_code
+            self.first_child[node] = NO_NODE
+            self.next_sibling[node] = NO_NODE
+            self.num_children[node] = 0
+            self.num_moves[node] = 0 if outcome is not None else UNKNOWN_NUM_MOVES
+            self.outcome[node] = NO_OUTCOME if outcome is None else outcome
+            self.visits[node] = 0
+            self.total_value[node] = 0.0
+            self.virtual_loss[node] = 0
+            self.prior[node] = prior
+            self.link[node] = node if link == NO_NODE else link
+            return node
+
+        node = len(self.parent)
+        self.parent.append(parent)
+        self.move.append(move_code)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.num_children.append(0)
+        self.num_moves.append(0 if outcome is not None else UNKNOWN_NUM_MOVES)
+        self.outcome.append(NO_OUTCOME if outcome is None else outcome)
+        self.visits.append(0)
+        self.total_value.append(0.0)
+        self.virtual_loss.append(0)
+        self.prior.append(prior)
+        self.link.append(node if link == NO_NODE else link)
+        return node
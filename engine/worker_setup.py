@@ -0,0 +1,24 @@
+from typing import Any, Dict, List
+
+import chess
+
+
+class WorkerSetup:
+    """
+    What a worker process needs to rebuild a search and its position, cheap to pickle: the constructor
+    arguments returned by the _get_options of the search, the FEN of the root position and the moves
+    played since in UCI notation. Replaying the moves instead of sending the current FEN keeps the move
+    stack that repetition detection reads.
+    """
+    __slots__ = ('options', 'root_fen', 'moves')
+
+    def __init__(self, search: Any, board: chess.Board):
+        self.options: Dict[str, Any] = search._get_options()
+        self.root_fen: str = board.root().fen()
+        self.moves: List[str] = [move.uci() for move in board.move_stack]
+
+    def get_board(self) -> chess.Board:
+        board = chess.Board(self.root_fen)
+        for uci in self.moves:
+            board.push_uci(uci)
+        return board
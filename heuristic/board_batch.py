@@ -0,0 +1,43 @@
+from typing import List
+
+import chess
+import numpy as np
+
+from heuristic.features.evaluation_context import EvaluationContext
+
+
+class BoardBatch:
+    """
+    Bitboards of several positions unpacked into NumPy arrays for batched evaluation.
+
+    pieces[n, int(color), piece_type, square] is 1.0 when the piece is on the square of the n-th board,
+    counts[n, int(color), piece_type] is the number of such pieces.
+    """
+
+    def __init__(self, boards: List[chess.Board]):
+        self.boards: List[chess.Board] = boards
+        self.size: int = len(boards)
+        self.turns: np.ndarray = np.array([board.turn for board in boards], dtype=bool)
+
+        bitboards = np.array([
+            [
+                [0, board.pawns & occupied, board.knights & occupied, board.bishops & occupied,
+                 board.rooks & occupied, board.queens & occupied, board.kings & occupied]
+                for occupied in [board.occupied_co[chess.BLACK], board.occupied_co[chess.WHITE]]
+            ]
+            for board in boards
+        ], dtype='<u8').reshape(self.size, 2, 7)
+
+        bits = np.unpackbits(bitboards.view(np.uint8), bitorder='little')
+        self.pieces: np.ndarray = bits.reshape(self.size, 2, 7, 64).astype(np.float64)
+        self.counts: np.ndarray = self.pieces.sum(axis=-1)
+
+        self._contexts: List[EvaluationContext] = []
+
+    def get_contexts(self) -> List[EvaluationContext]:
+        """
+        Per-board evaluation contexts for the features evaluated one board at a time, built on first use.
+        """
+        if not self._contexts and self.size:
+            self._contexts = [EvaluationContext(board) for board in self.boards]
+        return self._contexts
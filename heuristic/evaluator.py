@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
+from typing import Tuple, List
 
 import chess
+import numpy as np
 
 from heuristic.features.material_evaluator import PAWN_VALUE, KNIGHT_VALUE, BISHOP_VALUE, ROOK_VALUE, QUEEN_VALUE
 
@@ -12,6 +14,9 @@ PIECE_TO_VALUE = {
     chess.QUEEN: QUEEN_VALUE
 }
 
+# Stands for the king in exchanges, so that capturing with it onto a defended square never pays.
+KING_EXCHANGE_VALUE = 20000.0
+
 
 class Evaluator(ABC):
     @abstractmethod
@@ -27,6 +32,48 @@ class Evaluator(ABC):
         """
         pass
 
+    def evaluate_boards(self, boards: List[chess.Board]) -> np.ndarray:
+        """
+        Evaluate several independent positions, each for its own color to move.
+
+        Returns:
+            An array with the evaluate_board score of every board
+        """
+        return np.array([self.evaluate_board(board) for board in boards], dtype=np.float64)
+
+    def evaluate_board_lazy(self, board: chess.Board, alpha: float, beta: float) -> Tuple[float, bool]:
+        """
+        Evaluate a chess position for the color to move, allowing the evaluator to stop early
+        once the score is known to fall outside the (alpha, beta) window.
+
+        Returns:
+            The score and whether it comes from a full evaluation (False when it is only a partial score
+            already known to be outside the window)
+        """
+        return self.evaluate_board(board), True
+
+    def begin_search(self, board: chess.Board):
+        """
+        Called by a search on its root position, before any move is pushed.
+        Evaluators keeping incremental state initialize it here.
+        """
+        pass
+
+    def end_search(self):
+        pass
+
+    def push_move(self, board: chess.Board, move: chess.Move):
+        """
+        Called by a search right before the move is pushed on the board.
+        """
+        pass
+
+    def pop_move(self, board: chess.Board):
+        """
+        Called by a search right after a move has been popped from the board.
+        """
+        pass
+
     @staticmethod
     def evaluate_move(board: chess.Board, move: chess.Move) -> float:
         """
@@ -50,3 +97,69 @@ class Evaluator(ABC):
             attacker_value = PIECE_TO_VALUE.get(attacker_piece.piece_type, 0.)
             return 10 * victim_value - attacker_value
         return 0.0
+
+    @staticmethod
+    def evaluate_exchange(board: chess.Board, move: chess.Move) -> float:
+        """
+        Static exchange evaluation: the material the side to move wins with move once both sides have
+        recaptured on the target square with their least valuable attackers, each side being free to stop.
+        X-ray attackers behind the capturing pieces join in; pins are ignored.
+        """
+        to_square = move.to_square
+        occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+        if board.is_en_passant(move):
+            victim_value = PIECE_TO_VALUE[chess.PAWN]
+            captured_square = chess.square(chess.square_file(to_square), chess.square_rank(move.from_square))
+            occupied &= ~chess.BB_SQUARES[captured_square]
+        else:
+            victim_type = board.piece_type_at(to_square)
+            victim_value = PIECE_TO_VALUE.get(victim_type, 0.0) if victim_type else 0.0
+
+        attacker_type = board.piece_type_at(move.from_square)
+        attacker_value = _get_exchange_value(attacker_type)
+        if move.promotion:
+            victim_value += PIECE_TO_VALUE[move.promotion] - PIECE_TO_VALUE[chess.PAWN]
+            attacker_value = PIECE_TO_VALUE[move.promotion]
+
+        gains = [victim_value]
+        color = not board.turn
+        while True:
+            attackers = _get_attackers_mask(board, to_square, occupied) & board.occupied_co[color]
+            if not attackers:
+                break
+            for piece_type in chess.PIECE_TYPES:
+                piece_attackers = attackers & board.pieces_mask(piece_type, color)
+                if piece_attackers:
+                    break
+            # The piece on the square so far is captured by the least valuable attacker.
+            gains.append(attacker_value - gains[-1])
+            attacker_value = _get_exchange_value(piece_type)
+            occupied &= ~(piece_attackers & -piece_attackers)
+            color = not color
+
+        while len(gains) > 1:
+            gain = gains.pop()
+            gains[-1] = - max(- gains[-1], gain)
+        return gains[0]
+
+
+def _get_exchange_value(piece_type: chess.PieceType) -> float:
+    return KING_EXCHANGE_VALUE if piece_type == chess.KING else PIECE_TO_VALUE[piece_type]
+
+
+def _get_attackers_mask(board: chess.Board, square: chess.Square, occupied: chess.Bitboard) -> chess.Bitboard:
+    """
+    Pieces of both colors attacking square, with sliding attacks computed through the given occupancy.
+    """
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+    attackers = (
+        (chess.BB_KING_ATTACKS[square] & board.kings) |
+        (chess.BB_KNIGHT_ATTACKS[square] & board.knights) |
+        (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks) |
+        (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks) |
+        (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops) |
+        (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]) |
+        (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE])
+    )
+    return attackers & occupied
@@ -0,0 +1,39 @@
+from typing import Dict, List
+
+import chess
+
+ATTACKING_PIECE_TYPES = [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]
+
+
+class EvaluationContext:
+    """
+    Per-position data shared by the feature evaluators, so that every attack set
+    is computed once per evaluated position rather than once per feature and color.
+    Lists are indexed by color (and then by piece type for pieces).
+    """
+    __slots__ = ('pieces', 'piece_attacks', 'pawn_attacks', 'king_squares', 'king_zones')
+
+    def __init__(self, board: chess.Board):
+        self.pieces: List[List[int]] = [
+            [board.pieces_mask(piece_type, color) if piece_type else 0 for piece_type in range(7)]
+            for color in [chess.BLACK, chess.WHITE]
+        ]
+        self.piece_attacks: Dict[chess.Square, int] = {}
+        self.pawn_attacks: List[int] = [0, 0]
+        self.king_squares: List[chess.Square] = [0, 0]
+        self.king_zones: List[int] = [0, 0]
+
+        for color in [chess.WHITE, chess.BLACK]:
+            color_pieces = self.pieces[color]
+            for piece_type in ATTACKING_PIECE_TYPES:
+                for square in chess.scan_forward(color_pieces[piece_type]):
+                    self.piece_attacks[square] = board.attacks_mask(square)
+
+            pawn_attacks = 0
+            for square in chess.scan_forward(color_pieces[chess.PAWN]):
+                pawn_attacks |= chess.BB_PAWN_ATTACKS[color][square]
+            self.pawn_attacks[color] = pawn_attacks
+
+            king_square = board.king(color)
+            self.king_squares[color] = king_square
+            self.king_zones[color] = chess.BB_KING_ATTACKS[king_square] if king_square is not None else 0
@@ -1,20 +1,63 @@
-from abc import ABC, abstractmethod
+from abc import ABC
+from typing import Optional, TYPE_CHECKING
 
 import chess
+import numpy as np
+
+from heuristic.features.evaluation_context import EvaluationContext
+from heuristic.features.score import Score, taper
+
+if TYPE_CHECKING:
+    from heuristic.board_batch import BoardBatch
 
 
 class FeatureEvaluator(ABC):
-    @abstractmethod
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float) -> float:
+    """
+    A feature implements evaluate_score, or evaluate when it computes an already tapered score.
+    """
+
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
         """
-        Evaluate a feature of a chess position for the given color.
+        Evaluate a feature of a chess position for the given color, before tapering.
+        Defaults to the score of evaluate for both phases, which tapers back to that same score.
 
         Args:
             board: The chess board to evaluate
             color: The color to evaluate for (True for White, False for Black)
-            phase_value: The phase of the game (0 for endgame, 1 for opening)
+            phase_value: The phase of the game (0 for endgame, 1 for opening), only used to skip
+                terms that would barely count once tapered
+            context: Attack maps and piece bitboards of the position, shared between features;
+                built from the board when not given
+
+        Returns:
+            The (mg, eg) score of the feature for the given color
+        """
+        if type(self).evaluate is FeatureEvaluator.evaluate:
+            raise NotImplementedError(f"{type(self).__name__} implements neither evaluate_score nor evaluate")
+        score = self.evaluate(board, color, phase_value=phase_value, context=context)
+        return score, score
+
+    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                 context: Optional[EvaluationContext] = None) -> float:
+        """
+        Evaluate a feature of a chess position for the given color, tapered by phase_value.
 
         Returns:
             A float score representing the evaluation of the feature for the given color
         """
-        pass
+        return taper(self.evaluate_score(board, color, phase_value=phase_value, context=context), phase_value)
+
+    def evaluate_batch(self, batch: "BoardBatch", color: bool, phase_values: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the feature for the given color on every board of the batch.
+        Features without a vectorized implementation fall back to evaluate, one board at a time.
+
+        Returns:
+            An array with one score per board
+        """
+        contexts = batch.get_contexts()
+        return np.array([
+            self.evaluate(board, color, phase_value=float(phase_value), context=context)
+            for board, phase_value, context in zip(batch.boards, phase_values, contexts)
+        ], dtype=np.float64)
@@ -1,8 +1,10 @@
-from typing import Dict
+from typing import Dict, Optional
 
 import chess
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.score import Score
 
 KING_CENTRALIZATION = 20.0
 KING_PAWN_PROXIMITY = 10.0
@@ -15,7 +17,8 @@ class KingEndgameEvaluator(FeatureEvaluator):
         self.king_centralization = params.get("king_centralization", KING_CENTRALIZATION)
         self.king_pawn_proximity = params.get("king_pawn_proximity", KING_PAWN_PROXIMITY)
 
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
         score = 0.0
         king_square = board.king(color)
 
@@ -28,4 +31,4 @@ class KingEndgameEvaluator(FeatureEvaluator):
             min_dist_to_pawn = min(chess.square_distance(king_square, pawn_square) for pawn_square in pawn_list)
             score += (7 - min_dist_to_pawn) * self.king_pawn_proximity
 
-        return (1 - phase_value) * score
+        return 0.0, score
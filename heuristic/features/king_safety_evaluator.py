@@ -1,8 +1,10 @@
-from typing import Dict
+from typing import Dict, Optional
 
 import chess
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.score import Score, ZERO_SCORE
 from heuristic.features.utils import is_king_too_advanced, is_central_file
 
 PHASE_MINIMUM_VALUE = 0.1
@@ -28,41 +30,49 @@ class KingSafetyEvaluator(FeatureEvaluator):
         self.shield_masks = {chess.WHITE: [0] * 64, chess.BLACK: [0] * 64}
         self._precompute_shields()
 
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
+        # A middlegame only term, not worth computing once almost nothing is left of the middlegame weight.
         if phase_value < PHASE_MINIMUM_VALUE:
-            return 0
+            return ZERO_SCORE
+
+        if context is None:
+            context = EvaluationContext(board)
 
-        king_square = board.king(color)
+        king_square = context.king_squares[color]
         king_file = chess.square_file(king_square)
         king_rank = chess.square_rank(king_square)
 
-        penalty = self.get_king_attacked_penalty(board, color, king_square)
+        penalty = self.get_king_attacked_penalty(board, color, king_square, context)
         score = -penalty * self.attacked_weight
 
         if is_central_file(king_file) or is_king_too_advanced(king_rank, color):
-            return phase_value * score
+            return score, 0.0
 
         shield_mask = self.shield_masks[color][king_square]
-        friendly_pawns = board.pawns & board.occupied_co[color]
+        friendly_pawns = context.pieces[color][chess.PAWN]
         pawns_in_shield = (shield_mask & friendly_pawns).bit_count()
 
         num_files = bin(shield_mask).count('1')
         score += (pawns_in_shield * self.shield_bonus) - ((num_files - pawns_in_shield) * self.shield_penalty)
 
-        return phase_value * score
+        return score, 0.0
 
     @staticmethod
-    def get_king_attacked_penalty(board: chess.Board, color: bool, king_square: chess.Square):
-        enemy_color = not color
+    def get_king_attacked_penalty(board: chess.Board, color: bool, king_square: chess.Square,
+                                  context: Optional[EvaluationContext] = None):
+        if context is None:
+            context = EvaluationContext(board)
+
+        enemy_pieces = context.pieces[not color]
         king_zone_mask = chess.BB_KING_ATTACKS[king_square]
 
         num_attackers = 0
         total_attack_units = 0
 
         for piece_type, value in ATTACKER_VALUES.items():
-            enemies = board.pieces(piece_type, enemy_color)
-            for enemy_sq in enemies:
-                if board.attacks(enemy_sq) & king_zone_mask:
+            for enemy_sq in chess.scan_forward(enemy_pieces[piece_type]):
+                if context.piece_attacks[enemy_sq] & king_zone_mask:
                     num_attackers += 1
                     total_attack_units += value
 
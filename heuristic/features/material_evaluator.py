@@ -1,8 +1,14 @@
-from typing import Dict
+from typing import Dict, Optional, TYPE_CHECKING
 
 import chess
+import numpy as np
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.score import Score
+
+if TYPE_CHECKING:
+    from heuristic.board_batch import BoardBatch
 
 PAWN_VALUE = 100
 KNIGHT_VALUE = 320
@@ -28,12 +34,26 @@ class MaterialEvaluator(FeatureEvaluator):
             chess.QUEEN: params.get("queen_value_eg", QUEEN_VALUE)
         }
 
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
-        score = 0.0
+        self.piece_scores: Dict[chess.PieceType, Score] = {
+            piece: (self.piece_to_value_mg[piece], self.piece_to_value_eg[piece]) for piece in self.piece_to_value_mg
+        }
+
+        self.batch_values_mg: np.ndarray = np.zeros(7)
+        self.batch_values_eg: np.ndarray = np.zeros(7)
         for piece in self.piece_to_value_mg.keys():
-            piece_count = len(board.pieces(piece, color))
-            mg_value = self.piece_to_value_mg[piece]
-            eg_value = self.piece_to_value_eg[piece]
-            interpolated_value = mg_value * phase_value + eg_value * (1 - phase_value)
-            score += piece_count * interpolated_value
-        return score
+            self.batch_values_mg[piece] = self.piece_to_value_mg[piece]
+            self.batch_values_eg[piece] = self.piece_to_value_eg[piece]
+
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
+        mg_score = 0.0
+        eg_score = 0.0
+        for piece, (mg_value, eg_value) in self.piece_scores.items():
+            piece_count = board.pieces_mask(piece, color).bit_count()
+            mg_score += piece_count * mg_value
+            eg_score += piece_count * eg_value
+        return mg_score, eg_score
+
+    def evaluate_batch(self, batch: "BoardBatch", color: bool, phase_values: np.ndarray) -> np.ndarray:
+        counts = batch.counts[:, int(color)]
+        return (counts @ self.batch_values_mg) * phase_values + (counts @ self.batch_values_eg) * (1 - phase_values)
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+DEFAULT_PAWN_HASH_SIZE = 16384
+
+PawnKey = Tuple[int, int]
+PawnEntry = Tuple[float, float, float, float]
+
+
+class PawnHashTable:
+    """
+    Bounded LRU cache of pawn structure scores keyed on the (white, black) pawn bitboards.
+
+    Entries hold (white_mg, white_eg, black_mg, black_eg) so one lookup serves both colors.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_PAWN_HASH_SIZE):
+        self.max_size: int = max_size
+        self.entries: OrderedDict[PawnKey, PawnEntry] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: PawnKey) -> Optional[PawnEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: PawnKey, entry: PawnEntry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __getstate__(self):
+        # Cached entries are not worth shipping to other processes.
+        return {'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_size'])
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'hit_rate': self.get_hit_rate()
+        }
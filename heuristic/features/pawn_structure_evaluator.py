@@ -1,8 +1,15 @@
-from typing import Dict
+from typing import Dict, Tuple, Optional, TYPE_CHECKING
 
 import chess
+import numpy as np
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.pawn_hash_table import PawnHashTable, PawnEntry, DEFAULT_PAWN_HASH_SIZE
+from heuristic.features.score import Score
+
+if TYPE_CHECKING:
+    from heuristic.board_batch import BoardBatch
 
 PAWN_PASSED_MG = 5.0
 PAWN_PASSED_EG = 10.0
@@ -15,9 +22,12 @@ PAWN_CONNECTED_EG = 8.0
 PAWN_PHALANX_MG = 3.0
 PAWN_PHALANX_EG = 5.0
 
+ADJACENT_FILES = np.array([[abs(i - j) == 1 for j in range(8)] for i in range(8)], dtype=np.float64)
+NOT_FILE_A = np.array([chess.square_file(square) != 0 for square in range(64)], dtype=np.float64)
+
 
 class PawnStructureEvaluator(FeatureEvaluator):
-    def __init__(self, params: Dict[str, float]):
+    def __init__(self, params: Dict[str, float], pawn_hash_size: int = DEFAULT_PAWN_HASH_SIZE):
         self.passed_mg = params.get("pawn_passed_mg", PAWN_PASSED_MG)
         self.passed_eg = params.get("pawn_passed_eg", PAWN_PASSED_EG)
         self.isolated_mg = params.get("pawn_isolated_mg", PAWN_ISOLATED_MG)
@@ -33,11 +43,35 @@ class PawnStructureEvaluator(FeatureEvaluator):
         self.support_masks = {chess.WHITE: [0] * 64, chess.BLACK: [0] * 64}
 
         self._precompute_masks()
-
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
-        pawns = board.pawns & board.occupied_co[color]
-        enemy_pawns = board.pawns & board.occupied_co[not color]
-
+        self._precompute_batch_masks()
+
+        self.pawn_hash_table = PawnHashTable(pawn_hash_size)
+
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
+        white_mg, white_eg, black_mg, black_eg = self.get_pawn_scores(board)
+        if color == chess.WHITE:
+            return white_mg, white_eg
+        return black_mg, black_eg
+
+    def get_pawn_scores(self, board: chess.Board) -> PawnEntry:
+        """
+        Returns the (white_mg, white_eg, black_mg, black_eg) pawn structure scores,
+        looked up in the pawn hash table when the same pawn skeleton was already scored.
+        """
+        white_pawns = board.pawns & board.occupied_co[chess.WHITE]
+        black_pawns = board.pawns & board.occupied_co[chess.BLACK]
+        key = (white_pawns, black_pawns)
+
+        entry = self.pawn_hash_table.get(key)
+        if entry is None:
+            white_mg, white_eg = self._evaluate_pawns(white_pawns, black_pawns, chess.WHITE)
+            black_mg, black_eg = self._evaluate_pawns(black_pawns, white_pawns, chess.BLACK)
+            entry = (white_mg, white_eg, black_mg, black_eg)
+            self.pawn_hash_table.put(key, entry)
+        return entry
+
+    def _evaluate_pawns(self, pawns: int, enemy_pawns: int, color: bool) -> Tuple[float, float]:
         mg_score = 0.0
         eg_score = 0.0
 
@@ -76,7 +110,31 @@ class PawnStructureEvaluator(FeatureEvaluator):
         mg_score += num_phalanx * self.phalanx_mg
         eg_score += num_phalanx * self.phalanx_eg
 
-        return phase_value * mg_score + (1 - phase_value) * eg_score
+        return mg_score, eg_score
+
+    def evaluate_batch(self, batch: "BoardBatch", color: bool, phase_values: np.ndarray) -> np.ndarray:
+        pawns = batch.pieces[:, int(color), chess.PAWN]
+        enemy_pawns = batch.pieces[:, int(not color), chess.PAWN]
+        relative_ranks = self.batch_relative_ranks[color]
+
+        passed = pawns * ((enemy_pawns @ self.batch_front_spans[color].T) == 0)
+        passed_weight = passed @ (relative_ranks ** 2)
+
+        file_counts = pawns.reshape(batch.size, 8, 8).sum(axis=1)
+        has_neighbours = (file_counts @ ADJACENT_FILES) > 0
+        num_isolated = (file_counts * ~has_neighbours).sum(axis=1)
+        num_doubled = (file_counts * (file_counts > 1)).sum(axis=1)
+
+        supported = pawns * ((pawns @ self.batch_support_masks[color].T) > 0)
+        connected_weight = supported @ (1.0 + relative_ranks / 7.0)
+
+        num_phalanx = (pawns[:, 1:] * pawns[:, :-1] * NOT_FILE_A[1:]).sum(axis=1)
+
+        mg_score = passed_weight * self.passed_mg - num_isolated * self.isolated_mg - num_doubled * self.doubled_mg \
+            + connected_weight * self.connected_mg + num_phalanx * self.phalanx_mg
+        eg_score = passed_weight * self.passed_eg - num_isolated * self.isolated_eg - num_doubled * self.doubled_eg \
+            + connected_weight * self.connected_eg + num_phalanx * self.phalanx_eg
+        return phase_values * mg_score + (1 - phase_values) * eg_score
 
     @staticmethod
     def _get_file_occupancy(pawns: int) -> int:
@@ -108,3 +166,23 @@ class PawnStructureEvaluator(FeatureEvaluator):
                     if file < 7: support_mask |= (1 << chess.square(file + 1, support_rank))
 
                 self.support_masks[color][square] = support_mask
+
+    def _precompute_batch_masks(self):
+        """
+        Unpacks the front span and support masks into (square, square) matrices for evaluate_batch.
+        """
+        self.batch_front_spans: Dict[bool, np.ndarray] = {}
+        self.batch_support_masks: Dict[bool, np.ndarray] = {}
+        self.batch_relative_ranks: Dict[bool, np.ndarray] = {}
+        for color in [chess.WHITE, chess.BLACK]:
+            self.batch_front_spans[color] = self._unpack_masks(self.front_spans[color])
+            self.batch_support_masks[color] = self._unpack_masks(self.support_masks[color])
+            self.batch_relative_ranks[color] = np.array([
+                chess.square_rank(square) if color == chess.WHITE else 7 - chess.square_rank(square)
+                for square in range(64)
+            ], dtype=np.float64)
+
+    @staticmethod
+    def _unpack_masks(masks) -> np.ndarray:
+        bitboards = np.array(masks, dtype='<u8')
+        return np.unpackbits(bitboards.view(np.uint8), bitorder='little').reshape(64, 64).astype(np.float64)
@@ -1,4 +1,10 @@
+from typing import TYPE_CHECKING
+
 import chess
+import numpy as np
+
+if TYPE_CHECKING:
+    from heuristic.board_batch import BoardBatch
 
 KNIGHT_VALUE = 1
 BISHOP_VALUE = 1
@@ -14,6 +20,8 @@ PIECE_TO_VALUE = {
     chess.QUEEN: QUEEN_VALUE
 }
 
+BATCH_PIECE_VALUES = np.array([PIECE_TO_VALUE.get(piece, 0) for piece in range(7)], dtype=np.float64)
+
 
 class PhaseEvaluator:
     """
@@ -25,7 +33,26 @@ class PhaseEvaluator:
         """
         Returns a value between 0 and 1, where 1 is the opening and 0 is the endgame.
         """
-        score = 0.0
+        return PhaseEvaluator.from_score(PhaseEvaluator.get_score(board))
+
+    @staticmethod
+    def get_score(board: chess.Board) -> int:
+        """
+        Returns the raw weighted count of minor and major pieces on the board.
+        """
+        score = 0
         for piece, value in PIECE_TO_VALUE.items():
-            score += (len(board.pieces(piece, True)) + len(board.pieces(piece, False))) * value
+            score += (board.pieces_mask(piece, True).bit_count() + board.pieces_mask(piece, False).bit_count()) * value
+        return score
+
+    @staticmethod
+    def from_score(score: int) -> float:
         return min(1.0, score / MAX_VALUE)
+
+    @staticmethod
+    def evaluate_batch(batch: "BoardBatch") -> np.ndarray:
+        """
+        Returns the phase value of every board of the batch.
+        """
+        scores = batch.counts.sum(axis=1) @ BATCH_PIECE_VALUES
+        return np.minimum(1.0, scores / MAX_VALUE)
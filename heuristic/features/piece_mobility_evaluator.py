@@ -1,8 +1,10 @@
-from typing import Dict
+from typing import Dict, Optional
 
 import chess
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.score import Score
 
 MOBILITY_KNIGHT = 4
 MOBILITY_BISHOP = 3
@@ -25,12 +27,17 @@ class PieceMobilityEvaluator(FeatureEvaluator):
             chess.QUEEN: params.get("mobility_queen_eg", MOBILITY_QUEEN)
         }
 
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
+        if context is None:
+            context = EvaluationContext(board)
+
         mg_score = 0.0
         eg_score = 0.0
+        color_pieces = context.pieces[color]
         for piece_type in [chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN]:
-            for square in board.pieces(piece_type, color):
-                mobility = len(board.attacks(square))
+            for square in chess.scan_forward(color_pieces[piece_type]):
+                mobility = context.piece_attacks[square].bit_count()
                 mg_score += mobility * self.piece_to_weight_mg[piece_type]
                 eg_score += mobility * self.piece_to_weight_eg[piece_type]
-        return phase_value * mg_score + (1 - phase_value) * eg_score
+        return mg_score, eg_score
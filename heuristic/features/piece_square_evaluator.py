@@ -1,8 +1,14 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
 
 import chess
+import numpy as np
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.score import Score
+
+if TYPE_CHECKING:
+    from heuristic.board_batch import BoardBatch
 
 PAWN_TABLE = list(reversed([
     0, 0, 0, 0, 0, 0, 0, 0,
@@ -101,14 +107,39 @@ class PieceSquareEvaluator(FeatureEvaluator):
             chess.KING: params.get("king_square_table_eg", KING_ENDGAME_TABLE)
         }
 
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
-        score = 0.0
+        self.batch_tables_mg: Dict[bool, np.ndarray] = self._build_batch_tables(self.pst_tables_mg)
+        self.batch_tables_eg: Dict[bool, np.ndarray] = self._build_batch_tables(self.pst_tables_eg)
+
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
+        mg_score = 0.0
+        eg_score = 0.0
 
         for piece_type in [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]:
-            for square in board.pieces(piece_type, color):
-                idx = square if color == chess.WHITE else square ^ 56
-                mg_score = self.pst_tables_mg[piece_type][idx]
-                eg_score = self.pst_tables_eg[piece_type][idx]
-                score += phase_value * mg_score + (1 - phase_value) * eg_score
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                square_mg, square_eg = self.get_square_values(piece_type, color, square)
+                mg_score += square_mg
+                eg_score += square_eg
+
+        return mg_score, eg_score
+
+    def get_square_values(self, piece_type: chess.PieceType, color: bool, square: chess.Square) -> Tuple[float, float]:
+        idx = square if color == chess.WHITE else square ^ 56
+        return self.pst_tables_mg[piece_type][idx], self.pst_tables_eg[piece_type][idx]
+
+    def evaluate_batch(self, batch: "BoardBatch", color: bool, phase_values: np.ndarray) -> np.ndarray:
+        pieces = batch.pieces[:, int(color)].reshape(batch.size, 7 * 64)
+        mg_score = pieces @ self.batch_tables_mg[color].ravel()
+        eg_score = pieces @ self.batch_tables_eg[color].ravel()
+        return phase_values * mg_score + (1 - phase_values) * eg_score
 
-        return score
+    @staticmethod
+    def _build_batch_tables(pst_tables: Dict[chess.PieceType, List[float]]) -> Dict[bool, np.ndarray]:
+        """
+        Lays the tables out as (piece_type, square) arrays, with the black ones already mirrored.
+        """
+        white_tables = np.zeros((7, 64))
+        for piece_type, table in pst_tables.items():
+            white_tables[piece_type] = table
+        black_tables = white_tables[:, [square ^ 56 for square in range(64)]]
+        return {chess.WHITE: white_tables, chess.BLACK: black_tables}
@@ -0,0 +1,15 @@
+from typing import Tuple
+
+# Raw (middlegame, endgame) value of an evaluation term. Terms are summed as pairs and
+# blended by the game phase once, on the total, rather than once per piece or per feature.
+Score = Tuple[float, float]
+
+ZERO_SCORE: Score = (0.0, 0.0)
+
+
+def taper(score: Score, phase_value: float) -> float:
+    """
+    Blends a score by the phase of the game (0 for endgame, 1 for opening).
+    """
+    mg_score, eg_score = score
+    return phase_value * mg_score + (1 - phase_value) * eg_score
@@ -1,8 +1,10 @@
-from typing import Dict
+from typing import Dict, Optional
 
 import chess
 
+from heuristic.features.evaluation_context import EvaluationContext
 from heuristic.features.feature_evaluator import FeatureEvaluator
+from heuristic.features.score import Score
 from heuristic.features.utils import is_on_same_line, is_on_same_diagonal
 
 BISHOP_PAIR = 40
@@ -42,26 +44,27 @@ class StrategicBonusEvaluator(FeatureEvaluator):
             chess.BLACK: chess.BB_RANK_2
         }
 
-    def evaluate(self, board: chess.Board, color: bool, phase_value: float = 1.0) -> float:
+    def evaluate_score(self, board: chess.Board, color: bool, phase_value: float = 1.0,
+                       context: Optional[EvaluationContext] = None) -> Score:
+        if context is None:
+            context = EvaluationContext(board)
+
+        # Piece stability and coordination only count in the middlegame, the other terms in both phases.
         score = 0.0
+        mg_score = 0.0
 
-        own_pieces = board.occupied_co[color]
-        pawns = board.pawns & own_pieces
-        knights = board.knights & own_pieces
-        bishops = board.bishops & own_pieces
-        rooks = board.rooks & own_pieces
-        queens = board.queens & own_pieces
-        enemy_king_square = board.king(not color)
-        enemy_pawns = board.pawns & board.occupied_co[not color]
+        own_pieces = context.pieces[color]
+        pawns = own_pieces[chess.PAWN]
+        knights = own_pieces[chess.KNIGHT]
+        bishops = own_pieces[chess.BISHOP]
+        rooks = own_pieces[chess.ROOK]
+        queens = own_pieces[chess.QUEEN]
+        enemy_pawns = context.pieces[not color][chess.PAWN]
+        piece_attacks = context.piece_attacks
 
         # PIECE STABILITY
-        pawn_attacks = 0
-        for pawn_sq in chess.scan_forward(pawns):
-            pawn_attacks |= chess.BB_PAWN_ATTACKS[color][pawn_sq]
-
-        enemy_pawn_attacks = 0
-        for ep_sq in chess.scan_forward(enemy_pawns):
-            enemy_pawn_attacks |= chess.BB_PAWN_ATTACKS[not color][ep_sq]
+        pawn_attacks = context.pawn_attacks[color]
+        enemy_pawn_attacks = context.pawn_attacks[not color]
 
         minor_pieces = knights | bishops
         for square in chess.scan_forward(minor_pieces):
@@ -79,7 +82,7 @@ class StrategicBonusEvaluator(FeatureEvaluator):
                         if not (enemy_pawn_attacks & (1 << square)):
                             piece_status_score += self.knight_outpost
 
-            score += piece_status_score * phase_value
+            mg_score += piece_status_score
 
         # BISHOP PAIR
         if bishops.bit_count() >= 2:
@@ -112,10 +115,10 @@ class StrategicBonusEvaluator(FeatureEvaluator):
         # TRAPPED PIECES
         trapped_knights = knights & chess.BB_CORNERS
         for square in chess.scan_forward(trapped_knights):
-            if int(board.attacks(square)).bit_count() < 3:
+            if piece_attacks[square].bit_count() < 3:
                 score -= self.trapped_piece
 
-        king_square = board.king(color)
+        king_square = context.king_squares[color]
         occupied = board.occupied
         if color == chess.WHITE:
             if king_square == chess.G1 and (rooks & (1 << chess.H1)):
@@ -132,8 +135,8 @@ class StrategicBonusEvaluator(FeatureEvaluator):
             rook_squares = list(chess.scan_forward(rooks))
             for square in rook_squares:
                 file_mask = chess.BB_FILES[chess.square_file(square)]
-                if board.attacks(square) & rooks & file_mask:
-                    score += self.rook_battery / 2.0 * phase_value
+                if piece_attacks[square] & rooks & file_mask:
+                    mg_score += self.rook_battery / 2.0
 
             square1 = rook_squares[0]
             square2 = rook_squares[1]
@@ -141,25 +144,25 @@ class StrategicBonusEvaluator(FeatureEvaluator):
             if chess.square_rank(square1) == back_rank and chess.square_rank(square2) == back_rank:
                 between_mask = chess.between(square1, square2)
                 if not (between_mask & board.occupied):
-                    score += self.rook_connection * phase_value
+                    mg_score += self.rook_connection
 
         # QUEEN COORDINATION
         if queens:
             queen_square = next(chess.scan_forward(queens))
-            queen_attacks = board.attacks(queen_square)
-            enemy_king_zone = chess.BB_KING_ATTACKS[enemy_king_square]
+            queen_attacks = piece_attacks[queen_square]
+            enemy_king_zone = context.king_zones[not color]
 
             for bishop_square in chess.scan_forward(bishops):
-                if board.attacks(bishop_square) & queen_attacks:
+                if piece_attacks[bishop_square] & queen_attacks:
                     if is_on_same_diagonal(bishop_square, queen_square):
-                        score += self.queen_bishop_battery * phase_value
+                        mg_score += self.queen_bishop_battery
 
             for rook_sq in chess.scan_forward(rooks):
-                if is_on_same_line(queen_square, rook_sq) and (board.attacks(rook_sq) & queen_attacks):
-                    score += self.queen_rook_battery * phase_value
+                if is_on_same_line(queen_square, rook_sq) and (piece_attacks[rook_sq] & queen_attacks):
+                    mg_score += self.queen_rook_battery
 
             for night_square in chess.scan_forward(knights):
-                if (board.attacks(night_square) & enemy_king_zone) and (queen_attacks & enemy_king_zone):
-                    score += self.queen_knight_coordination * phase_value
+                if (piece_attacks[night_square] & enemy_king_zone) and (queen_attacks & enemy_king_zone):
+                    mg_score += self.queen_knight_coordination
 
-        return score
+        return score + mg_score, score
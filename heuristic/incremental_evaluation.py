@@ -0,0 +1,96 @@
+from typing import List, Tuple
+
+import chess
+
+from heuristic.features.phase_evaluator import PhaseEvaluator, PIECE_TO_VALUE as PHASE_PIECE_TO_VALUE
+from heuristic.features.score import Score
+from heuristic.material_square_table import MaterialSquareTable, to_score
+
+
+class IncrementalEvaluation:
+    """
+    Running material and piece-square sums (as untapered mg/eg pairs) and phase score of a position,
+    updated move by move during a search instead of being recomputed at every node. The sums add the
+    fixed point entries of the MaterialSquareTable, so they are exact and equal to its evaluate_score.
+
+    push must be called with the board *before* the move is played, pop after it has been taken back.
+    """
+
+    def __init__(self, material_square_table: MaterialSquareTable):
+        self.material_square_table = material_square_table
+
+        self.scores_mg: List[int] = [0, 0]
+        self.scores_eg: List[int] = [0, 0]
+        self.phase_score: int = 0
+
+        self._stack: List[Tuple[List[int], List[int], int]] = []
+
+    def reset(self, board: chess.Board):
+        self.scores_mg = [0, 0]
+        self.scores_eg = [0, 0]
+        self.phase_score = 0
+        self._stack = []
+
+        for color in [chess.WHITE, chess.BLACK]:
+            for piece_type in chess.PIECE_TYPES:
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    self._add_piece(piece_type, color, square)
+
+    def push(self, board: chess.Board, move: chess.Move):
+        self._stack.append((self.scores_mg[:], self.scores_eg[:], self.phase_score))
+
+        if move == chess.Move.null():
+            return
+
+        color = board.turn
+        piece_type = board.piece_type_at(move.from_square)
+
+        if board.is_castling(move):
+            rank = chess.square_rank(move.from_square)
+            kingside = board.is_kingside_castling(move)
+            if board.rooks & board.occupied_co[color] & chess.BB_SQUARES[move.to_square]:
+                rook_from = move.to_square
+            else:
+                rook_from = chess.square(7 if kingside else 0, rank)
+            self._move_piece(chess.KING, color, move.from_square, chess.square(6 if kingside else 2, rank))
+            self._move_piece(chess.ROOK, color, rook_from, chess.square(5 if kingside else 3, rank))
+            return
+
+        if board.is_en_passant(move):
+            captured_square = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+            self._remove_piece(chess.PAWN, not color, captured_square)
+        else:
+            captured_type = board.piece_type_at(move.to_square)
+            if captured_type:
+                self._remove_piece(captured_type, not color, move.to_square)
+
+        self._remove_piece(piece_type, color, move.from_square)
+        self._add_piece(move.promotion or piece_type, color, move.to_square)
+
+    def pop(self):
+        self.scores_mg, self.scores_eg, self.phase_score = self._stack.pop()
+
+    def get_phase_value(self) -> float:
+        return PhaseEvaluator.from_score(self.phase_score)
+
+    def get_score(self, color: bool) -> Score:
+        """
+        Material and piece-square score of color, before tapering.
+        """
+        return to_score(self.scores_mg[color], self.scores_eg[color])
+
+    def _add_piece(self, piece_type: chess.PieceType, color: bool, square: chess.Square):
+        square_mg, square_eg = self.material_square_table.scores[color][piece_type][square]
+        self.scores_mg[color] += square_mg
+        self.scores_eg[color] += square_eg
+        self.phase_score += PHASE_PIECE_TO_VALUE.get(piece_type, 0)
+
+    def _remove_piece(self, piece_type: chess.PieceType, color: bool, square: chess.Square):
+        square_mg, square_eg = self.material_square_table.scores[color][piece_type][square]
+        self.scores_mg[color] -= square_mg
+        self.scores_eg[color] -= square_eg
+        self.phase_score -= PHASE_PIECE_TO_VALUE.get(piece_type, 0)
+
+    def _move_piece(self, piece_type: chess.PieceType, color: bool, from_square: chess.Square, to_square: chess.Square):
+        self._remove_piece(piece_type, color, from_square)
+        self._add_piece(piece_type, color, to_square)
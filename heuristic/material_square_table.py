@@ -0,0 +1,50 @@
+from typing import List, Tuple
+
+import chess
+
+from heuristic.features.material_evaluator import MaterialEvaluator
+from heuristic.features.piece_square_evaluator import PieceSquareEvaluator
+from heuristic.features.score import Score, ZERO_SCORE
+
+# Table entries are integer multiples of 1 / FIXED_POINT_SCALE. Integer sums do not depend on the order of the
+# additions, so the running sums of an IncrementalEvaluation stay equal to a full evaluation with any weights.
+FIXED_POINT_SCALE = 1 << 16
+
+
+class MaterialSquareTable:
+    """
+    Material values folded into the piece-square tables at construction, so that a piece on a square is
+    scored by a single (mg, eg) lookup. scores[color][piece_type][square], with the black squares mirrored,
+    holds fixed point values that to_score turns back into a Score once summed.
+    """
+
+    def __init__(self, material_evaluator: MaterialEvaluator, piece_square_evaluator: PieceSquareEvaluator):
+        self.scores: List[List[List[Tuple[int, int]]]] = [[[(0, 0)] * 64 for _ in range(7)] for _ in range(2)]
+        for color in [chess.BLACK, chess.WHITE]:
+            for piece_type in chess.PIECE_TYPES:
+                material_mg, material_eg = material_evaluator.piece_scores.get(piece_type, ZERO_SCORE)
+                for square in range(64):
+                    square_mg, square_eg = piece_square_evaluator.get_square_values(piece_type, color, square)
+                    self.scores[color][piece_type][square] = (
+                        round((material_mg + square_mg) * FIXED_POINT_SCALE),
+                        round((material_eg + square_eg) * FIXED_POINT_SCALE)
+                    )
+
+    def evaluate_score(self, board: chess.Board, color: bool) -> Score:
+        mg_score = 0
+        eg_score = 0
+        color_scores = self.scores[color]
+        for piece_type in chess.PIECE_TYPES:
+            piece_scores = color_scores[piece_type]
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                square_mg, square_eg = piece_scores[square]
+                mg_score += square_mg
+                eg_score += square_eg
+        return to_score(mg_score, eg_score)
+
+
+def to_score(mg_score: int, eg_score: int) -> Score:
+    """
+    The Score of a sum of MaterialSquareTable entries.
+    """
+    return mg_score / FIXED_POINT_SCALE, eg_score / FIXED_POINT_SCALE
@@ -1,6 +1,12 @@
+from typing import Optional, Tuple, List
+
 import chess
+import numpy as np
 
+from heuristic.board_batch import BoardBatch
 from heuristic.evaluator import Evaluator
+from heuristic.features.evaluation_context import EvaluationContext
+from heuristic.features.feature_evaluator import FeatureEvaluator
 from heuristic.features.king_endgame_evaluator import KingEndgameEvaluator
 from heuristic.features.king_safety_evaluator import KingSafetyEvaluator
 from heuristic.features.material_evaluator import MaterialEvaluator
@@ -8,7 +14,16 @@ from heuristic.features.pawn_structure_evaluator import PawnStructureEvaluator
 from heuristic.features.phase_evaluator import PhaseEvaluator
 from heuristic.features.piece_mobility_evaluator import PieceMobilityEvaluator
 from heuristic.features.piece_square_evaluator import PieceSquareEvaluator
+from heuristic.features.score import Score, taper
 from heuristic.features.strategic_bonus_evaluator import StrategicBonusEvaluator
+from heuristic.incremental_evaluation import IncrementalEvaluation
+from heuristic.material_square_table import MaterialSquareTable
+
+# Swings of the terms not yet computed after each stage of a lazy evaluation, to pass as lazy_margins.
+# They cover typical positions rather than the largest terms (king safety alone reaches about 960),
+# so a lazy score can miss the window it was cut against and lazy evaluation is off by default.
+LAZY_MARGIN_MATERIAL = 500.0
+LAZY_MARGIN_POSITIONAL = 350.0
 
 
 class PositionalEvaluator(Evaluator):
@@ -19,7 +34,9 @@ class PositionalEvaluator(Evaluator):
                  king_safety_evaluator: KingSafetyEvaluator,
                  strategic_bonus_evaluator: StrategicBonusEvaluator,
                  king_endgame_evaluator: KingEndgameEvaluator,
-                 piece_square_evaluator: PieceSquareEvaluator):
+                 piece_square_evaluator: PieceSquareEvaluator,
+                 debug_incremental: bool = False,
+                 lazy_margins: Optional[Tuple[float, float]] = None):
         self.material_evaluator = material_evaluator
         self.piece_mobility_evaluator = piece_mobility_evaluator
         self.pawn_structure_evaluator = pawn_structure_evaluator
@@ -28,19 +45,115 @@ class PositionalEvaluator(Evaluator):
         self.king_endgame_evaluator = king_endgame_evaluator
         self.piece_square_evaluator = piece_square_evaluator
 
+        # Staged evaluation: material and PST, then the cheap positional terms, then the attack based ones.
+        # With lazy_margins, it stops after a stage whose score is outside the window by more than its margin.
+        self.lazy_margins = lazy_margins
+        self.positional_features: List[FeatureEvaluator] = [pawn_structure_evaluator, king_endgame_evaluator]
+        self.attack_features: List[FeatureEvaluator] = [
+            piece_mobility_evaluator, king_safety_evaluator, strategic_bonus_evaluator
+        ]
+
+        # Features return untapered (mg, eg) pairs, summed over the whole evaluation before a single taper.
+        self.material_square_table = MaterialSquareTable(material_evaluator, piece_square_evaluator)
+        self.incremental_evaluation = IncrementalEvaluation(self.material_square_table)
+        self.debug_incremental = debug_incremental
+        self._search_board: Optional[chess.Board] = None
+        self._search_stack_size: int = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_search_board'] = None
+        state['_search_stack_size'] = 0
+        return state
+
+    def begin_search(self, board: chess.Board):
+        self.incremental_evaluation.reset(board)
+        self._search_board = board
+        self._search_stack_size = len(board.move_stack)
+
+    def end_search(self):
+        self._search_board = None
+
+    def push_move(self, board: chess.Board, move: chess.Move):
+        if board is self._search_board:
+            self.incremental_evaluation.push(board, move)
+            self._search_stack_size += 1
+
+    def pop_move(self, board: chess.Board):
+        if board is self._search_board:
+            self.incremental_evaluation.pop()
+            self._search_stack_size -= 1
+
     def evaluate_board(self, board: chess.Board) -> float:
-        phase_value = PhaseEvaluator.evaluate(board)
-        own_score = self._get_color_score(board, board.turn, phase_value)
-        enemy_score = self._get_color_score(board, not board.turn, phase_value)
-        return own_score - enemy_score
-
-    def _get_color_score(self, board: chess.Board, color: bool, phase_value: float) -> float:
-        score = 0.0
-        score += self.material_evaluator.evaluate(board, color, phase_value=phase_value)
-        score += self.piece_mobility_evaluator.evaluate(board, color, phase_value=phase_value)
-        score += self.pawn_structure_evaluator.evaluate(board, color, phase_value=phase_value)
-        score += self.king_safety_evaluator.evaluate(board, color, phase_value=phase_value)
-        score += self.strategic_bonus_evaluator.evaluate(board, color, phase_value=phase_value)
-        score += self.king_endgame_evaluator.evaluate(board, color, phase_value=phase_value)
-        score += self.piece_square_evaluator.evaluate(board, color, phase_value=phase_value)
+        score, _ = self.evaluate_board_lazy(board, -float('inf'), float('inf'))
         return score
+
+    def evaluate_boards(self, boards: List[chess.Board]) -> np.ndarray:
+        batch = BoardBatch(boards)
+        phase_values = PhaseEvaluator.evaluate_batch(batch)
+
+        features = [self.material_evaluator, self.piece_square_evaluator] + \
+            self.positional_features + self.attack_features
+        white_score = np.zeros(batch.size)
+        for feature in features:
+            white_score += feature.evaluate_batch(batch, chess.WHITE, phase_values)
+            white_score -= feature.evaluate_batch(batch, chess.BLACK, phase_values)
+        return np.where(batch.turns, white_score, -white_score)
+
+    def evaluate_board_lazy(self, board: chess.Board, alpha: float, beta: float) -> Tuple[float, bool]:
+        if board is not self._search_board or len(board.move_stack) != self._search_stack_size:
+            return self._evaluate_staged(board, alpha, beta, None)
+
+        result = self._evaluate_staged(board, alpha, beta, self.incremental_evaluation)
+        if self.debug_incremental:
+            full_result = self._evaluate_staged(board, alpha, beta, None)
+            if result != full_result:
+                raise AssertionError(
+                    f"Incremental evaluation {result} differs from full evaluation {full_result} for {board.fen()}")
+        return result
+
+    def _evaluate_staged(self, board: chess.Board, alpha: float, beta: float,
+                         incremental: Optional[IncrementalEvaluation]) -> Tuple[float, bool]:
+        own_color = board.turn
+        enemy_color = not board.turn
+
+        if incremental is None:
+            phase_value = PhaseEvaluator.evaluate(board)
+            own_mg, own_eg = self.material_square_table.evaluate_score(board, own_color)
+            enemy_mg, enemy_eg = self.material_square_table.evaluate_score(board, enemy_color)
+        else:
+            phase_value = incremental.get_phase_value()
+            own_mg, own_eg = incremental.get_score(own_color)
+            enemy_mg, enemy_eg = incremental.get_score(enemy_color)
+        mg_score = own_mg - enemy_mg
+        eg_score = own_eg - enemy_eg
+        score = taper((mg_score, eg_score), phase_value)
+        if self.lazy_margins is not None and self._is_outside_window(score, alpha, beta, self.lazy_margins[0]):
+            return score, False
+
+        features_mg, features_eg = self._get_features_score(board, self.positional_features, phase_value, None)
+        mg_score += features_mg
+        eg_score += features_eg
+        score = taper((mg_score, eg_score), phase_value)
+        if self.lazy_margins is not None and self._is_outside_window(score, alpha, beta, self.lazy_margins[1]):
+            return score, False
+
+        context = EvaluationContext(board)
+        features_mg, features_eg = self._get_features_score(board, self.attack_features, phase_value, context)
+        return taper((mg_score + features_mg, eg_score + features_eg), phase_value), True
+
+    @staticmethod
+    def _get_features_score(board: chess.Board, features: List[FeatureEvaluator], phase_value: float,
+                            context: Optional[EvaluationContext]) -> Score:
+        mg_score = 0.0
+        eg_score = 0.0
+        for feature in features:
+            own_mg, own_eg = feature.evaluate_score(board, board.turn, phase_value=phase_value, context=context)
+            enemy_mg, enemy_eg = feature.evaluate_score(board, not board.turn, phase_value=phase_value, context=context)
+            mg_score += own_mg - enemy_mg
+            eg_score += own_eg - enemy_eg
+        return mg_score, eg_score
+
+    @staticmethod
+    def _is_outside_window(score: float, alpha: float, beta: float, margin: float) -> bool:
+        return score + margin <= alpha or score - margin >= beta
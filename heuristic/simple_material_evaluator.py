@@ -1,5 +1,9 @@
+from typing import List
+
 import chess
+import numpy as np
 
+from heuristic.board_batch import BoardBatch
 from heuristic.evaluator import Evaluator
 from heuristic.features.material_evaluator import MaterialEvaluator
 
@@ -12,3 +16,10 @@ class SimpleMaterialEvaluator(Evaluator):
         own_score = self.material_evaluator.evaluate(board, board.turn)
         enemy_score = self.material_evaluator.evaluate(board, not board.turn)
         return own_score - enemy_score
+
+    def evaluate_boards(self, boards: List[chess.Board]) -> np.ndarray:
+        batch = BoardBatch(boards)
+        phase_values = np.ones(batch.size)
+        white_score = self.material_evaluator.evaluate_batch(batch, chess.WHITE, phase_values) - \
+            self.material_evaluator.evaluate_batch(batch, chess.BLACK, phase_values)
+        return np.where(batch.turns, white_score, -white_score)
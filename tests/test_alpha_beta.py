@@ -0,0 +1,31 @@
+import chess
+
+from benchmarks.utils import build_positional_evaluator
+from engine.alpha_beta import AlphaBeta, CHECKMATE_SCORE, MAX_PLY
+
+MATE_IN_THREE_FEN = "r1b1kb1r/pppp1ppp/5q2/4n3/3KP3/2N3PN/PPP4P/R1BQ1B1R b kq - 0 1"
+
+
+def get_mate_ply(score: float) -> float:
+    return CHECKMATE_SCORE + MAX_PLY - score
+
+
+def test_mate_distance_survives_transposition_table_reuse():
+    evaluator = build_positional_evaluator()
+    reused = AlphaBeta(evaluator)
+    board = chess.Board(MATE_IN_THREE_FEN)
+
+    mate_plies = []
+    for reply in ["d4c5", "c5d5", None]:
+        move = reused.get_best_move(board, depth=5)
+        fresh = AlphaBeta(evaluator)
+        fresh.get_best_move(board, depth=5)
+        assert reused.stats.score == fresh.stats.score
+        mate_plies.append(get_mate_ply(reused.stats.score))
+
+        board.push(move)
+        if reply is not None:
+            board.push_uci(reply)
+
+    assert mate_plies == [5, 3, 1]
+    assert board.is_checkmate()
@@ -0,0 +1,33 @@
+from benchmarks.utils import get_benchmark_boards
+from engine.alpha_beta import AlphaBeta
+from heuristic.features.king_endgame_evaluator import KingEndgameEvaluator
+from heuristic.features.king_safety_evaluator import KingSafetyEvaluator
+from heuristic.features.material_evaluator import MaterialEvaluator
+from heuristic.features.pawn_structure_evaluator import PawnStructureEvaluator
+from heuristic.features.piece_mobility_evaluator import PieceMobilityEvaluator
+from heuristic.features.piece_square_evaluator import PieceSquareEvaluator, PAWN_TABLE, KNIGHT_TABLE
+from heuristic.features.strategic_bonus_evaluator import StrategicBonusEvaluator
+from heuristic.positional_evaluator import PositionalEvaluator
+
+
+def build_fractional_evaluator() -> PositionalEvaluator:
+    return PositionalEvaluator(
+        material_evaluator=MaterialEvaluator({"pawn_value_mg": 82.1, "knight_value_eg": 281.37}),
+        piece_mobility_evaluator=PieceMobilityEvaluator({}),
+        pawn_structure_evaluator=PawnStructureEvaluator({}),
+        king_safety_evaluator=KingSafetyEvaluator({}),
+        strategic_bonus_evaluator=StrategicBonusEvaluator({}),
+        king_endgame_evaluator=KingEndgameEvaluator({}),
+        piece_square_evaluator=PieceSquareEvaluator({
+            "pawn_square_table_mg": [value + 0.13 * (square % 7) for square, value in enumerate(PAWN_TABLE)],
+            "knight_square_table_eg": [value * 1.07 for value in KNIGHT_TABLE],
+        }),
+        debug_incremental=True
+    )
+
+
+def test_incremental_evaluation_matches_full_evaluation_with_fractional_weights():
+    evaluator = build_fractional_evaluator()
+    for board in get_benchmark_boards():
+        # debug_incremental raises an AssertionError on the first node where the two evaluations differ.
+        AlphaBeta(evaluator).get_best_move(board, depth=3)